@@ -1,6 +1,10 @@
+import os
 from flask import Flask
 from app.models import db
 from app.extensions import ma, limiter, cache
+from app.utils.metrics import init_metrics
+from app.utils.querystats import init_query_stats
+from app.utils.pubsub import hub
 from app.blueprints.users import users_bp
 from app.blueprints.transactions import transactions_bp
 from app.blueprints.listings import listings_bp
@@ -8,18 +12,27 @@ from app.blueprints.skills import skills_bp
 from app.blueprints.search import search_bp
 from app.blueprints.profile import profile_bp
 from app.blueprints.messages import messages_bp
+from app.blueprints.reviews import reviews_bp
 from flask_cors import CORS
 
 
 def create_app(config_name):
     app = Flask(__name__, static_url_path='/static', static_folder='static')
     app.config.from_object(f"config.{config_name}")
-
+    if app.config.get("CACHE_TYPE") == "FileSystemCache" and not app.config.get("CACHE_DIR"):
+        app.config["CACHE_DIR"] = os.path.join(app.instance_path, "cache")
+    if app.config.get("RATELIMIT_STORAGE_URI") is None:
+        # Private to the app, unlike a predictable name in a shared /tmp
+        os.makedirs(app.instance_path, mode=0o700, exist_ok=True)
+        app.config["RATELIMIT_STORAGE_URI"] = f"mmap://{os.path.join(app.instance_path, 'ratelimit.bin')}"
+    init_metrics(app)
 
     db.init_app(app)
     ma.init_app(app)
     limiter.init_app(app)
     cache.init_app(app)
+    init_query_stats(app)
+    hub.init_app(app)
 
     CORS(app, resources={r"/*": {"origins": "http://localhost:5173"}}, supports_credentials=True)
  
@@ -31,6 +44,7 @@ def create_app(config_name):
     app.register_blueprint(search_bp, url_prefix='/search')
     app.register_blueprint(profile_bp, url_prefix="/profile")
     app.register_blueprint(messages_bp, url_prefix="/messages")
+    app.register_blueprint(reviews_bp, url_prefix="/reviews")
  
 
     return app
\ No newline at end of file
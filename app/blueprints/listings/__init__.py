@@ -1,6 +1,6 @@
 from flask import Blueprint
 
 
-listings_bp = Blueprint('listings_bp', __name__)
+listings_bp = Blueprint('listings_bp', __name__, cli_group='listings')
 
 from . import routes
\ No newline at end of file
@@ -1,16 +1,22 @@
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from app.blueprints.listings import listings_bp
-from app.models import Listing, db
+from app.models import Listing, Transaction, Message, db
 from marshmallow import ValidationError
-from sqlalchemy import select
+from sqlalchemy import select, exists
 from app.blueprints.listings.schemas import listing_schema, listings_schema, ListingSchema
 from datetime import datetime
 from app.utils.util import token_required
-from flask import send_from_directory
-from geopy.distance import geodesic
-from geopy.geocoders import Nominatim
+from app.utils.geo import get_zip_centroids, bounding_box, filter_within_radius
+from app.utils.pagination import paginate, page_size
+from app.utils.search import index_listing, unindex_listing, match_listings
+from app.utils.caching import cached_response, invalidate
+from app.utils.streaming import wants_stream, stream_query
+from app.utils.fields import requested_fields, sparse_schema, project
+from app.utils.serializers import compiled, dump_many
+from app.utils.uploads import receive_image, resolve_image
+from app.utils.images import schedule_variants, send_image
+from werkzeug.exceptions import RequestEntityTooLarge
 import os
-import base64
 
 # Image upload folder
 UPLOAD_FOLDER = os.path.abspath('uploads/listing_images')
@@ -43,21 +49,22 @@ def create_listing(current_user):
         if not (city and state and zip_code):
             return jsonify({"error": "City, state, and zip code are required for location"}), 400
         
+        # The image is either a reference returned by POST /listings/images or,
+        # from older clients, a base64 data URL; both end up content-addressed
         image_data = validated_data.get("image")
         if image_data:
             try:
-                # Decode the base64 image and save it as a file
-                file_data = base64.b64decode(image_data.split(",")[1])  
-                filename = f"{current_user.id}_listing_{new_listing.id}.png"
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                with open(file_path, "wb") as f:
-                    f.write(file_data)
-                image_path = f"/listing_images/{filename}"  
+                filename = resolve_image(image_data, UPLOAD_FOLDER)
+                schedule_variants(UPLOAD_FOLDER, filename)
+                image_path = f"/listing_images/{filename}"
             except Exception as e:
                 return jsonify({"error": f"Failed to process image: {str(e)}"}), 400
         else:
             image_path = None  # No image provided
 
+        # Resolve the ZIP centroid once so proximity search never has to geocode
+        coordinates = get_zip_centroids().lookup(zip_code) or (None, None)
+
         # Create a new Listing
         new_listing = Listing(
             user_id=current_user.id,
@@ -70,18 +77,15 @@ def create_listing(current_user):
             offered_skill=validated_data.get("offered_skill"),
             wanted_skill=validated_data.get("wanted_skill"),
             image=image_path,
+            latitude=coordinates[0],
+            longitude=coordinates[1],
             created_at=datetime.utcnow(),
         )
         db.session.add(new_listing)
+        db.session.flush()
+        index_listing(new_listing)
         db.session.commit()
-
-        if image_data:
-            filename = f"{current_user.id}_listing_{new_listing.id}.png"
-            file_path = os.path.join(UPLOAD_FOLDER, filename)
-            with open(file_path, "wb") as f:
-                f.write(file_data)
-                new_listing.image = f"/listing_images/{filename}"
-                db.session.commit()
+        invalidate("listings:list")
 
         return jsonify({
             "message": "Listing created successfully",
@@ -92,10 +96,26 @@ def create_listing(current_user):
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
-# Route to serve image files
+# Route to upload a listing image ahead of creating the listing (multipart, field "image").
+# The body is streamed to disk and stored under its sha256, so re-uploads are free.
+@listings_bp.route("/images", methods=["POST"])
+@token_required
+def upload_listing_image(current_user):
+    try:
+        filename = receive_image(UPLOAD_FOLDER)
+        schedule_variants(UPLOAD_FOLDER, filename)
+        return jsonify({"image": f"/listing_images/{filename}"}), 201
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Image is too large"}), 413
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+# Route to serve image files; ?size=thumb|preview picks a WebP variant
 @listings_bp.route("/listing_images/<filename>", methods=["GET"])
 def serve_image(filename):
-    return send_from_directory(UPLOAD_FOLDER, filename)
+    return send_image(UPLOAD_FOLDER, filename, request.args.get("size"))
 
 # Route to get all listings
 @listings_bp.route("/search", methods=["GET"])
@@ -109,19 +129,33 @@ def search_listings():
         wanted_skill = request.args.get("wanted_skill")
         offered_skill = request.args.get("offered_skill")
         proximity = request.args.get("proximity", type=int)
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
 
         print(f"Received filters: type={type_filter}, city={city}, state={state}, zip_code={zip_code}, wanted_skill={wanted_skill}, offered_skill={offered_skill}, proximity={proximity}")
 
-        query = db.session.query(Listing)
+        query = select(Listing)
 
         # Apply filters
         if type_filter:
             query = query.filter(Listing.type == type_filter)
-        if city:
-            query = query.filter(Listing.city.ilike(f"%{city}%"))
-        if state:
-            query = query.filter(Listing.state.ilike(f"%{state}%"))
-        if zip_code:
+        if city or state:
+            # Answered from the inverted index instead of a LIKE scan
+            query = match_listings(query, city=city, state=state)
+        origin = None
+        if zip_code and proximity:
+            # The ZIP is the search origin: prefilter on the indexed lat/lon
+            # bounding box, then run the exact distance check on what's left
+            origin = get_zip_centroids().lookup(zip_code)
+            if origin:
+                min_lat, max_lat, min_lon, max_lon = bounding_box(origin[0], origin[1], proximity)
+                query = query.filter(
+                    Listing.latitude.between(min_lat, max_lat),
+                    Listing.longitude.between(min_lon, max_lon),
+                )
+            else:
+                print(f"Proximity filter skipped: unknown ZIP code {zip_code}")
+        elif zip_code:
             query = query.filter(Listing.zip_code == zip_code)
         if wanted_skill:
             query = query.filter(Listing.wanted_skill == int(wanted_skill))
@@ -130,38 +164,22 @@ def search_listings():
 
         print(f"Query before execution: {str(query)}")
 
-        # Execute the query
-        listings = query.all()
+        # Execute the query one keyset page at a time; the exact distance check
+        # runs per batch so a page is filled without loading every match
+        keep = None
+        if origin:
+            keep = lambda batch: filter_within_radius(batch, origin[0], origin[1], proximity)
+        listings, next_cursor, has_more = paginate(query, Listing, cursor, limit, keep=keep)
         print(f"Found {len(listings)} listings matching filters.")
 
-        # Apply proximity filter if zip_code and proximity are provided
-        if zip_code and proximity:
-            try:
-                geolocator = Nominatim(user_agent="listings_search")
-                location = geolocator.geocode({"postalcode": zip_code, "country": "United States"})
-                if location:
-                    user_location = (location.latitude, location.longitude)
-                    filtered_listings = []
-
-                    for listing in listings:
-                        if listing.zip_code:
-                            listing_location = geolocator.geocode(
-                                {"postalcode": listing.zip_code, "country": "United States"}
-                            )
-                            if listing_location:
-                                listing_coords = (listing_location.latitude, listing_location.longitude)
-                                distance = geodesic(user_location, listing_coords).miles
-                                if distance <= proximity:
-                                    filtered_listings.append(listing)
-
-                    listings = filtered_listings
-            except Exception as e:
-                print(f"Proximity filter error: {e}")
-
          # Serialize the data using Marshmallow
-        serialized_listings = listings_schema.dump(listings)
-        return jsonify(serialized_listings), 200
-
+        return jsonify({
+            "listings": dump_many(listings_schema, listings),
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         # Print the full error message
         print(f"Error during search: {e}")
@@ -169,20 +187,37 @@ def search_listings():
 
 
 @listings_bp.route("/", methods=["GET"])
+@cached_response("listings:list")
 def get_all_listings():
     try:
-        page = request.args.get("page", default=1, type=int)
-        per_page = request.args.get("per_page", default=10, type=int)
+        fields = requested_fields(listings_schema)  # ?fields=id,title,...
+        query = project(select(Listing), Listing, fields, extra=("created_at",))
+
+        if wants_stream():
+            # Whole collection, newest first, without paging
+            return stream_query(
+                query.order_by(Listing.created_at.desc(), Listing.id.desc()),
+                compiled(sparse_schema(ListingSchema, fields)),
+            )
 
-        # Query all listings
-        query = db.session.execute(select(Listing).order_by(Listing.created_at.desc()))
-        listings = query.scalars().all()
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
 
-        return jsonify(listings_schema.dump(listings)), 200
+        # Newest first, keyset-paginated on (created_at, id)
+        listings, next_cursor, has_more = paginate(query, Listing, cursor, limit)
+
+        return jsonify({
+            "listings": dump_many(sparse_schema(ListingSchema, fields), listings),
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }), 200
+    except ValueError as ve:
+        return jsonify({"error": str(ve)}), 400
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
     
 @listings_bp.route("/<int:listing_id>", methods=["GET"])
+@cached_response("listing:{listing_id}")
 def get_listing(listing_id):
     try:
         print(f"Fetching listing with ID: {listing_id}")
@@ -199,3 +234,67 @@ def get_listing(listing_id):
         print(f"An error occurred: {e}")
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+
+
+@listings_bp.route("/<int:listing_id>", methods=["DELETE"])
+@token_required
+def delete_listing(current_user, listing_id):
+    try:
+        listing = db.session.get(Listing, listing_id)
+        if not listing:
+            return jsonify({"error": "Listing not found"}), 404
+        if listing.user_id != current_user.id:
+            return jsonify({"error": "Unauthorized action"}), 403
+
+        # Transactions and messages keep pointing at their listing (both
+        # columns are NOT NULL), so a listing that has any can't go
+        in_use = db.session.execute(
+            select(
+                exists().where(Transaction.listing_id == listing_id)
+                | exists().where(Message.listing_id == listing_id)
+            )
+        ).scalar()
+        if in_use:
+            return jsonify({"error": "Listing has transactions or messages and can't be deleted"}), 409
+
+        unindex_listing(listing.id)
+        db.session.delete(listing)
+        db.session.commit()
+        invalidate(f"listing:{listing_id}", "listings:list")
+        return jsonify({"message": "Listing deleted successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception("Failed to delete listing %s", listing_id)
+        return jsonify({"error": "Could not delete listing"}), 500
+
+
+# Fill in coordinates for listings created before they were stored:
+#   flask --app app listings backfill-coordinates
+@listings_bp.cli.command("backfill-coordinates")
+def backfill_coordinates():
+    centroids = get_zip_centroids()
+    listings = db.session.execute(
+        select(Listing).where(Listing.latitude.is_(None))
+    ).scalars().all()
+
+    updated = 0
+    for listing in listings:
+        coordinates = centroids.lookup(listing.zip_code)
+        if coordinates:
+            listing.latitude, listing.longitude = coordinates
+            updated += 1
+    db.session.commit()
+    print(f"Backfilled coordinates for {updated} of {len(listings)} listings.")
+
+
+# Rebuild the search index for every listing:
+#   flask --app app listings reindex
+@listings_bp.cli.command("reindex")
+def reindex_listings():
+    listing_ids = db.session.execute(select(Listing.id)).scalars().all()
+    for start in range(0, len(listing_ids), 500):
+        chunk = listing_ids[start:start + 500]
+        for listing in db.session.execute(select(Listing).where(Listing.id.in_(chunk))).scalars():
+            index_listing(listing)
+        db.session.commit()
+    print(f"Indexed {len(listing_ids)} listings.")
@@ -1,11 +1,86 @@
-from flask import request, jsonify
+from flask import request, jsonify, Response, current_app
 from app.blueprints.messages import messages_bp
-from app.models import Message, db, Listing
+from app.models import Message, MessageTerm, Conversation, User, db, Listing
 from app.utils.util import token_required
 from marshmallow import ValidationError
 from datetime import datetime
 from app.utils.util import token_required
 from app.blueprints.messages.schemas import message_schema, messages_schema
+from app.utils.streaming import wants_stream, stream_query
+from app.utils.pagination import paginate, page_size
+from app.utils.conversations import record_message, mark_read
+from app.utils.search import index_message, match_messages
+from app.utils.pubsub import hub, run_broker
+from app.utils.group_commit import GroupCommitter, GroupCommitBusy, GroupCommitPending
+import threading
+import click
+import json
+from sqlalchemy import select, update, insert, delete, exists, or_
+from sqlalchemy.orm import aliased
+
+
+def save_message(message):
+    # Adds a new message and sets its thread: a reply joins its parent's
+    # thread, anything else starts one rooted at itself. Both participants'
+    # conversation rows and search postings are updated too, and the
+    # recipient's open streams get the message once the caller commits.
+    if message.reply_to_id:
+        parent = db.session.execute(
+            select(Message.id, Message.thread_id).where(Message.id == message.reply_to_id)
+        ).first()
+        if parent:
+            message.thread_id = parent.thread_id or parent.id
+    db.session.add(message)
+    db.session.flush()
+    if message.thread_id is None:
+        message.thread_id = message.id
+    record_message(message)
+    index_message(message)
+    hub.publish_after_commit(db.session, f"user:{message.recipient_id}", message_schema.dump(message))
+
+
+# Seconds a request waits for its group commit before giving up
+GROUP_COMMIT_TIMEOUT = 10
+_committer_lock = threading.Lock()
+
+
+def _write_message(fields):
+    message = Message(**fields)
+    save_message(message)
+    return message_schema.dump(message)
+
+
+def _group_committer():
+    # One per app, started with the first message
+    with _committer_lock:
+        committer = current_app.extensions.get("message_group_commit")
+        if committer is None:
+            committer = GroupCommitter(
+                current_app._get_current_object(),
+                _write_message,
+                max_batch=current_app.config.get("MESSAGE_GROUP_COMMIT_BATCH", 100),
+                max_wait=current_app.config.get("MESSAGE_GROUP_COMMIT_WAIT", 0.005),
+            )
+            current_app.extensions["message_group_commit"] = committer
+    return committer
+
+
+def store_message(**fields):
+    """Insert a message and commit; returns it as message_schema dumps it.
+
+    With MESSAGE_GROUP_COMMIT on, the write goes through the group
+    committer and this returns once the batch holding it has committed.
+    Raises GroupCommitBusy when that queue is full, or when the wait timed
+    out before the message was written; GroupCommitPending when it timed
+    out with the message already in a batch that may still commit.
+    """
+    if current_app.config.get("MESSAGE_GROUP_COMMIT"):
+        committer = _group_committer()
+        return committer.wait(committer.submit(fields), GROUP_COMMIT_TIMEOUT)
+    stored = _write_message(fields)
+    db.session.commit()
+    return stored
+
 
 @messages_bp.route("/create", methods=["POST"])
 @token_required
@@ -24,7 +99,7 @@ def create_message(current_user):
             return jsonify({"error": "Recepient ID and content are required"}), 400
 
         # Create a new message
-        new_message = Message(
+        new_message = store_message(
             sender_id=current_user.id,
             recipient_id=recipient_id,
             content=content,
@@ -32,10 +107,13 @@ def create_message(current_user):
             label=label,
             reply_to_id=reply_to_id
         )
-        db.session.add(new_message)
-        db.session.commit()
 
-        return jsonify({"message": "Message sent successfully"}), 201
+        return jsonify({"message": "Message sent successfully", "id": new_message["id"]}), 201
+    except GroupCommitBusy:
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+    except GroupCommitPending:
+        # Retrying could send it twice; the mailbox shows whether it went through
+        return jsonify({"message": "Message accepted, delivery not yet confirmed"}), 202
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
@@ -56,7 +134,7 @@ def send_message(current_user):
             return jsonify({"error": "Recipient ID and content are required"}), 400
 
         # Create a new message
-        new_message = Message(
+        new_message = store_message(
             sender_id=current_user.id,
             recipient_id=recipient_id,
             content=content,
@@ -65,41 +143,60 @@ def send_message(current_user):
             created_at=datetime.utcnow(),
         )
 
-        db.session.add(new_message)
-        db.session.commit()
-
-        return jsonify({"message": "Message sent successfully"}), 201
+        return jsonify({"message": "Message sent successfully", "id": new_message["id"]}), 201
+    except GroupCommitBusy:
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+    except GroupCommitPending:
+        # Retrying could send it twice; the mailbox shows whether it went through
+        return jsonify({"message": "Message accepted, delivery not yet confirmed"}), 202
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
 
 
+def _mailbox_row(row):
+    # Inbox/sent-box entry from a (Message, Listing) row; the listing comes
+    # from the outer join, so no per-message lazy load
+    msg, listing = row
+    return {
+        "id": msg.id,
+        "recipient_id": msg.recipient_id,
+        "content": msg.content,
+        "listing_id": msg.listing_id,
+        "listing_title": listing.title if listing else None,
+        "listing_description": listing.description if listing else None,
+        "created_at": msg.created_at,
+    }
+
+
 @messages_bp.route("/", methods=["GET"])
 @token_required
 def get_messages(current_user):
     try:
         # Fetch messages where the logged-in user is the recipient
-        messages = (
-            db.session.query(Message, Listing)
+        query = (
+            select(Message, Listing)
             .outerjoin(Listing, Message.listing_id == Listing.id)
             .filter(Message.recipient_id == current_user.id)
-            .order_by(Message.created_at.desc())
-            .all()
         )
+        if wants_stream():
+            # Whole mailbox, newest first, without paging
+            return stream_query(
+                query.order_by(Message.created_at.desc(), Message.id.desc()), _mailbox_row, scalars=False
+            )
+
+        # Newest first, keyset-paginated on (created_at, id)
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+        messages, next_cursor, has_more = paginate(query, Message, cursor, limit, scalars=False)
 
-        messages_list = [
-            {
-                "id": msg.id,
-                "recipient_id": msg.recipient_id,
-                "content": msg.content,
-                "listing_id": msg.listing_id,
-                "listing_title": msg.listing.title if msg.listing else None,
-                "listing_description": msg.listing.description if msg.listing else None,
-                "created_at": msg.created_at,
-            }
-            for msg, listing in messages
-        ]
-        return jsonify(messages_list), 200
+        return jsonify({
+            "messages": [_mailbox_row(row) for row in messages],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
@@ -109,27 +206,29 @@ def get_messages(current_user):
 def get_sent_messages(current_user):
     try:
         
-        messages = (
-            db.session.query(Message, Listing)
+        query = (
+            select(Message, Listing)
             .outerjoin(Listing, Message.listing_id == Listing.id)
             .filter(Message.sender_id == current_user.id)
-            .order_by(Message.created_at.desc())
-            .all()
         )
+        if wants_stream():
+            # Whole mailbox, newest first, without paging
+            return stream_query(
+                query.order_by(Message.created_at.desc(), Message.id.desc()), _mailbox_row, scalars=False
+            )
 
-        sent_messages_list = [
-            {
-                "id": msg.id,
-                "recipient_id": msg.recipient_id,
-                "content": msg.content,
-                "listing_id": msg.listing_id,
-                "listing_title": msg.listing.title if msg.listing else None,
-                "listing_description": msg.listing.description if msg.listing else None,
-                "created_at": msg.created_at,
-            }
-            for msg, listing in messages
-        ]
-        return jsonify(sent_messages_list), 200
+        # Newest first, keyset-paginated on (created_at, id)
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+        messages, next_cursor, has_more = paginate(query, Message, cursor, limit, scalars=False)
+
+        return jsonify({
+            "messages": [_mailbox_row(row) for row in messages],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
@@ -161,7 +260,7 @@ def reply_message(current_user):
         print(f"Recipient ID: {recipient_id}, Content: {content}, Listing ID: {listing_id}, Reply To: {reply_to_id}")
 
         # Create a new message
-        new_message = Message(
+        new_message = store_message(
             sender_id=current_user.id,
             recipient_id=recipient_id,
             content=content,
@@ -170,10 +269,283 @@ def reply_message(current_user):
             created_at=datetime.utcnow()
         )
 
-        db.session.add(new_message)
+        return jsonify(new_message), 201
+    except GroupCommitBusy:
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+    except GroupCommitPending:
+        # Retrying could send it twice; the mailbox shows whether it went through
+        return jsonify({"message": "Message accepted, delivery not yet confirmed"}), 202
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+
+
+@messages_bp.route("/thread/<int:message_id>", methods=["GET"])
+@token_required
+def get_thread(current_user, message_id):
+    # Any message of the thread works as the id; the root is the usual one
+    message = db.session.get(Message, message_id)
+    if not message or current_user.id not in (message.sender_id, message.recipient_id):
+        return jsonify({"error": "Message not found"}), 404
+
+    query = (
+        select(Message)
+        .where(
+            Message.thread_id == (message.thread_id or message.id),
+            or_(Message.sender_id == current_user.id, Message.recipient_id == current_user.id),
+        )
+        .order_by(Message.created_at, Message.id)
+    )
+    messages = db.session.execute(query).scalars().all()
+    return jsonify({"thread_id": message.thread_id, "messages": messages_schema.dump(messages)}), 200
+
+
+# Search the caller's own messages: ?q=words&page=1&limit=10, best match first
+@messages_bp.route("/search", methods=["GET"])
+@token_required
+def search_messages(current_user):
+    try:
+        hits = match_messages(current_user.id, request.args.get("q", ""))
+        if hits is None:
+            return jsonify({"error": "A search query (q) is required"}), 400
+
+        page = max(request.args.get("page", 1, type=int), 1)
+        limit = page_size(request.args.get("limit", type=int))
+        ranked = hits.offset((page - 1) * limit).limit(limit + 1).subquery()
+        query = (
+            select(Message, ranked.c.score)
+            .join(ranked, Message.id == ranked.c.message_id)
+            .order_by(ranked.c.score.desc(), Message.id.desc())
+        )
+        rows = db.session.execute(query).all()
+
+        results = []
+        for message, score in rows[:limit]:
+            result = message_schema.dump(message)
+            result["score"] = score
+            results.append(result)
+        return jsonify({
+            "messages": results,
+            "page": page,
+            "limit": limit,
+            "has_more": len(rows) > limit,
+        }), 200
+    except Exception as e:
+        return jsonify({"error": f"An error occurred: {str(e)}"}), 500
+
+
+# Rebuild the mailbox search index, e.g. for messages sent before it existed:
+#   flask --app app messages reindex
+@messages_bp.cli.command("reindex")
+def reindex_messages():
+    db.session.execute(delete(MessageTerm))
+    message_ids = db.session.execute(select(Message.id)).scalars().all()
+    for start in range(0, len(message_ids), 500):
+        chunk = message_ids[start:start + 500]
+        for message in db.session.execute(select(Message).where(Message.id.in_(chunk))).scalars():
+            index_message(message)
         db.session.commit()
+    print(f"Indexed {len(message_ids)} messages.")
+
+
+# Seconds between keep-alive comments on an idle stream
+STREAM_KEEPALIVE = 15
+# Page size for replaying messages to a client that reconnects with Last-Event-ID
+STREAM_CATCH_UP = 100
+
+
+def _sse(payload):
+    return f"id: {payload['id']}\nevent: message\ndata: {json.dumps(payload)}\n\n"
+
+
+def _missed_page(user_id, after_id):
+    # One page of catch-up; the connection goes back to the pool right away
+    try:
+        query = (
+            select(Message)
+            .where(Message.recipient_id == user_id, Message.id > after_id)
+            .order_by(Message.id)
+            .limit(STREAM_CATCH_UP)
+        )
+        return messages_schema.dump(db.session.execute(query).scalars())
+    finally:
+        db.session.remove()
+
+
+# New messages for the caller as Server-Sent Events. Idle connections cost a
+# thread and a queue, no queries; run behind a threaded or async worker.
+@messages_bp.route("/stream", methods=["GET"])
+@token_required
+def stream_messages(current_user):
+    user_id = current_user.id
+    app = current_app._get_current_object()
+    # Subscribed first, so nothing sent meanwhile falls in the gap
+    subscription = hub.subscribe(f"user:{user_id}")
+    last_id = request.headers.get("Last-Event-ID", type=int)
+    db.session.remove()  # Don't hold a pooled connection for the life of the stream
+
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            sent = last_id or 0
+            if last_id:
+                # Page until caught up with the database, however much was
+                # missed; live events queue up meanwhile
+                while True:
+                    with app.app_context():
+                        page = _missed_page(user_id, sent)
+                    for payload in page:
+                        sent = payload["id"]
+                        yield _sse(payload)
+                    if len(page) < STREAM_CATCH_UP:
+                        break
+            while True:
+                payload = subscription.get(timeout=STREAM_KEEPALIVE)
+                if payload is None:
+                    yield ": keep-alive\n\n"
+                elif payload["id"] > sent:  # Older ids were replayed from the database
+                    yield _sse(payload)
+        finally:
+            subscription.close()
+
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Let nginx pass events through unbuffered
+    })
+
+
+# Relay for PUBSUB_URL=tcp://... when several workers serve /messages/stream:
+#   flask --app app messages broker --port 6390
+@messages_bp.cli.command("broker")
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=6390, show_default=True)
+def pubsub_broker(host, port):
+    print(f"Pub/sub broker listening on {host}:{port}")
+    run_broker(host, port)
+
 
-        return jsonify(message_schema.dump(new_message)), 201
+def _conversation_row(row):
+    conversation, message, listing, peer = row
+    return {
+        "peer_id": conversation.peer_id,
+        "peer_name": f"{peer.firstname} {peer.lastname}" if peer else None,
+        "listing_id": conversation.listing_id,
+        "listing_title": listing.title if listing else None,
+        "last_activity_at": conversation.last_activity_at,
+        "unread_count": conversation.unread_count,
+        "last_message": {
+            "id": message.id,
+            "sender_id": message.sender_id,
+            "content": message.content,
+            "created_at": message.created_at,
+        },
+    }
+
+
+@messages_bp.route("/conversations", methods=["GET"])
+@token_required
+def get_conversations(current_user):
+    try:
+        # One row per conversation from the read model, with the last
+        # message, listing and peer joined in
+        query = (
+            select(Conversation, Message, Listing, User)
+            .join(Message, Message.id == Conversation.last_message_id)
+            .outerjoin(Listing, Listing.id == Conversation.listing_id)
+            .outerjoin(User, User.id == Conversation.peer_id)
+            .where(Conversation.user_id == current_user.id)
+        )
+        cursor = request.args.get("cursor")
+        limit = page_size(request.args.get("limit", type=int))
+        conversations, next_cursor, has_more = paginate(
+            query, Conversation, cursor, limit, scalars=False,
+            order_by=(Conversation.last_activity_at, Conversation.last_message_id),
+        )
+
+        return jsonify({
+            "conversations": [_conversation_row(row) for row in conversations],
+            "next_cursor": next_cursor,
+            "has_more": has_more,
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": f"An error occurred: {str(e)}"}), 500
 
+
+@messages_bp.route("/conversations/<int:peer_id>/<int:listing_id>/read", methods=["POST"])
+@token_required
+def mark_conversation_read(current_user, peer_id, listing_id):
+    if not mark_read(current_user.id, peer_id, listing_id):
+        return jsonify({"error": "Conversation not found"}), 404
+    db.session.commit()
+    return jsonify({"message": "Conversation marked as read"}), 200
+
+
+# Rebuild the conversations table from the messages, e.g. for messages sent
+# before it existed. Read state isn't stored per message, so unread counts
+# restart at zero:
+#   flask --app app messages rebuild-conversations
+@messages_bp.cli.command("rebuild-conversations")
+def rebuild_conversations():
+    latest = {}
+    query = select(Message.id, Message.sender_id, Message.recipient_id, Message.listing_id, Message.created_at)
+    for message in db.session.execute(query.execution_options(yield_per=1000)):
+        for user_id, peer_id in ((message.sender_id, message.recipient_id), (message.recipient_id, message.sender_id)):
+            key = (user_id, peer_id, message.listing_id)
+            current = latest.get(key)
+            if current is None or (message.created_at, message.id) > current:
+                latest[key] = (message.created_at, message.id)
+
+    db.session.execute(delete(Conversation))
+    rows = [
+        {
+            "user_id": user_id,
+            "peer_id": peer_id,
+            "listing_id": listing_id,
+            "last_message_id": message_id,
+            "last_activity_at": created_at,
+            "unread_count": 0,
+        }
+        for (user_id, peer_id, listing_id), (created_at, message_id) in latest.items()
+    ]
+    for start in range(0, len(rows), 1000):
+        db.session.execute(insert(Conversation), rows[start:start + 1000])
+    db.session.commit()
+    print(f"Rebuilt {len(rows)} conversation rows.")
+
+
+# Set thread_id on messages stored before it existed:
+#   flask --app app messages backfill-threads
+@messages_bp.cli.command("backfill-threads")
+def backfill_threads():
+    parent = aliased(Message)
+    child = aliased(Message)
+
+    # Roots: not a reply, or a reply whose parent is gone
+    chain = (
+        select(Message.id.label("id"), Message.id.label("root_id"))
+        .where(or_(
+            Message.reply_to_id.is_(None),
+            ~exists().where(parent.id == Message.reply_to_id),
+        ))
+        .cte("chain", recursive=True)
+    )
+    chain = chain.union_all(
+        select(child.id, chain.c.root_id).where(child.reply_to_id == chain.c.id)
+    )
+    pending = db.session.execute(
+        select(chain.c.id, chain.c.root_id)
+        .join(Message, Message.id == chain.c.id)
+        .where(Message.thread_id.is_(None))
+    ).all()
+
+    # Plain UPDATEs by primary key, in executemany batches; MySQL won't take
+    # an UPDATE whose subquery reads the table being updated
+    for start in range(0, len(pending), 1000):
+        db.session.execute(
+            update(Message),
+            [{"id": message_id, "thread_id": root_id} for message_id, root_id in pending[start:start + 1000]],
+        )
+        db.session.commit()
+    print(f"Set thread_id on {len(pending)} messages.")
@@ -9,6 +9,7 @@ class MessageSchema(Schema):
     listing_id = fields.Int(required=False, allow_none=True)
     label = fields.Str(required=False, allow_none=True)
     reply_to_id = fields.Int(required=False, allow_none=True)
+    thread_id = fields.Int(dump_only=True)
 
 # Create schema instances for single and multiple messages
 message_schema = MessageSchema()
@@ -1,18 +1,27 @@
 from . import profile_bp
-from flask import request, jsonify
+from flask import request, jsonify, url_for
 from app.models import User, Profile, db, Skill, user_skills
 from app.utils.util import token_required
 from app.blueprints.profile.schemas import profile_schema
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from flask_cors import cross_origin
+from app.utils.uploads import receive_image, resolve_image
+from app.utils.images import schedule_variants, send_image
+from app.utils.geo import lookup_place
+from werkzeug.exceptions import RequestEntityTooLarge
 import requests
 import os
-import base64
 
 UPLOAD_FOLDER = os.path.join("static", "profile-images")
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+
+def _image_url(filename):
+    # Uploads live outside the app's static folder; serve_profile_image serves them
+    return url_for("profile.serve_profile_image", filename=filename)
+
+
 @profile_bp.route("/users/<int:user_id>/skills", methods=["GET"])
 @token_required
 def get_user_skills(current_user, user_id):
@@ -28,6 +37,28 @@ def get_user_skills(current_user, user_id):
     return jsonify({"user_id": user.id, "skills": skills}), 200
 
 
+# Upload a profile picture before creating the profile (multipart, field "image")
+@profile_bp.route("/images", methods=["POST"])
+@token_required
+def upload_profile_image(current_user):
+    try:
+        filename = receive_image(UPLOAD_FOLDER)
+        schedule_variants(UPLOAD_FOLDER, filename)
+        return jsonify({"profile_picture": _image_url(filename)}), 201
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({"error": "Image is too large"}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+# Serve an uploaded profile picture; ?size=thumb|preview picks a WebP variant
+@profile_bp.route("/images/<filename>", methods=["GET"])
+def serve_profile_image(filename):
+    return send_image(UPLOAD_FOLDER, filename, request.args.get("size"))
+
+
 @profile_bp.route("/createprofile", methods=["POST"])
 @token_required
 def create_profile(current_user):
@@ -48,13 +79,15 @@ def create_profile(current_user):
         if not zip_code:
             return jsonify({"error": "ZIP code is required"}), 400
         
-        response = requests.get(f"http://api.zippopotam.us/us/{zip_code}")
-        if response.status_code != 200:
+        # Resolved from the bundled ZIP table; only unknown ZIPs hit the network
+        try:
+            place = lookup_place(zip_code)
+        except requests.RequestException:
+            return jsonify({"error": "ZIP code lookup is unavailable, please try again"}), 503
+        if not place:
             return jsonify({"error": "Invalid ZIP code"}), 400
 
-        location_data = response.json()
-        city = location_data["places"][0]["place name"]
-        state = location_data["places"][0]["state"]
+        city, state = place
 
         # Check if the user already has a profile
         query = db.session.execute(
@@ -68,14 +101,11 @@ def create_profile(current_user):
         # Handle optional profile picture
         profile_picture_data = profile_data.get('profile_picture')
         if profile_picture_data:
-            # Decode the base64 string and save it as a file
+            # Either a reference from POST /profile/images or a base64 data URL
             try:
-                file_data = base64.b64decode(profile_picture_data.split(",")[1])  # Remove "data:image/*;base64,"
-                filename = f"{user_id}_profile_picture.png"
-                file_path = os.path.join(UPLOAD_FOLDER, filename)
-                with open(file_path, "wb") as f:
-                    f.write(file_data)
-                profile_picture_path = f"/{UPLOAD_FOLDER}/{filename}"
+                filename = resolve_image(profile_picture_data, UPLOAD_FOLDER)
+                schedule_variants(UPLOAD_FOLDER, filename)
+                profile_picture_path = _image_url(filename)
 
             except Exception as e:
                 return jsonify({"error": f"Failed to process profile picture: {str(e)}"}), 400
@@ -112,7 +142,7 @@ def create_profile(current_user):
             zip_code=zip_code,  # Add zip_code
             profile_picture=profile_picture_path,
             social_links=profile_data.get('social_links'),
-            account_type=profile_data.get('account_type', 'regular'),
+            account_type='regular',  # Never from the client; admins are promoted with `flask users set-account-type`
             bio=profile_data.get('bio'),
         )
         db.session.add(new_profile)
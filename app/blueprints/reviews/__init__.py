@@ -0,0 +1,6 @@
+from flask import Blueprint
+
+
+reviews_bp = Blueprint('reviews_bp', __name__, cli_group='reviews')
+
+from . import routes
@@ -0,0 +1,189 @@
+from flask import request, jsonify
+from marshmallow import ValidationError
+from sqlalchemy import select, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from app.blueprints.reviews import reviews_bp
+from app.blueprints.reviews.schemas import review_schema, reviews_schema, review_update_schema
+from app.models import Review, Transaction, Listing, User, db
+from app.utils.util import token_required
+from app.utils.pagination import paginate, page_size
+
+
+def adjust_rating(user_id, sum_delta, count_delta):
+    # One UPDATE relative to the stored values, so concurrent reviews can't
+    # lose each other's changes. `rating` goes first: MySQL evaluates SET
+    # left to right, and it has to see the old sum and count like every
+    # other database does.
+    new_sum = User.rating_sum + sum_delta
+    new_count = User.rating_count + count_delta
+    db.session.execute(
+        update(User)
+        .where(User.id == user_id)
+        .ordered_values(
+            (User.rating, case((new_count > 0, new_sum / new_count), else_=0)),
+            (User.rating_sum, new_sum),
+            (User.rating_count, new_count),
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+def _other_party(transaction, user_id):
+    # The requester reviews the listing owner and vice versa
+    owner_id = db.session.execute(
+        select(Listing.user_id).where(Listing.id == transaction.listing_id)
+    ).scalar_one_or_none()
+    if user_id == transaction.requester_id:
+        return owner_id
+    if user_id == owner_id:
+        return transaction.requester_id
+    return None
+
+
+@reviews_bp.route("/", methods=["POST"])
+@token_required
+def create_review(current_user):
+    try:
+        review_data = review_schema.load(request.json)
+    except ValidationError as e:
+        return jsonify({"errors": e.messages}), 400
+
+    try:
+        transaction = db.session.get(Transaction, review_data["transaction_id"])
+        if not transaction:
+            return jsonify({"error": "Transaction not found"}), 404
+
+        reviewee_id = _other_party(transaction, current_user.id)
+        if reviewee_id is None or reviewee_id == current_user.id:
+            return jsonify({"error": "Only the other party of a transaction can be reviewed"}), 403
+
+        review = Review(
+            reviewer_id=current_user.id,
+            reviewee_id=reviewee_id,
+            transaction_id=transaction.id,
+            rating=review_data["rating"],
+            comment=review_data.get("comment"),
+        )
+        db.session.add(review)
+        db.session.flush()  # The unique constraint fires here, before the aggregate moves
+        adjust_rating(reviewee_id, review.rating, 1)
+        db.session.commit()
+        return review_schema.jsonify(review), 201
+    except IntegrityError:
+        db.session.rollback()
+        return jsonify({"error": "You have already reviewed this transaction"}), 409
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@reviews_bp.route("/<int:review_id>", methods=["PUT"])
+@token_required
+def update_review(current_user, review_id):
+    review = db.session.get(Review, review_id)
+    if not review:
+        return jsonify({"error": "Review not found"}), 404
+    if review.reviewer_id != current_user.id:
+        return jsonify({"error": "Unauthorized action"}), 403
+
+    try:
+        review_data = review_update_schema.load(request.json)
+    except ValidationError as e:
+        return jsonify({"errors": e.messages}), 400
+
+    try:
+        if "rating" in review_data and review_data["rating"] != review.rating:
+            # Conditional on the rating we read, so the delta is applied to
+            # the aggregate only by the request that actually changed it
+            old_rating = review.rating
+            changed = db.session.execute(
+                update(Review)
+                .where(Review.id == review_id, Review.rating == old_rating)
+                .values(rating=review_data["rating"])
+            ).rowcount
+            if changed != 1:
+                db.session.rollback()
+                return jsonify({"error": "Review was changed by another request, try again"}), 409
+            adjust_rating(review.reviewee_id, review_data["rating"] - old_rating, 0)
+        if "comment" in review_data:
+            review.comment = review_data["comment"]
+        db.session.commit()
+        return review_schema.jsonify(review), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@reviews_bp.route("/<int:review_id>", methods=["DELETE"])
+@token_required
+def delete_review(current_user, review_id):
+    review = db.session.get(Review, review_id)
+    if not review:
+        return jsonify({"error": "Review not found"}), 404
+    if review.reviewer_id != current_user.id:
+        return jsonify({"error": "Unauthorized action"}), 403
+
+    try:
+        # Only the request whose DELETE removed the row (with the rating we
+        # read) takes it out of the aggregate; a repeated delete is a no-op
+        reviewee_id, rating = review.reviewee_id, review.rating
+        deleted = db.session.execute(
+            delete(Review).where(Review.id == review_id, Review.rating == rating)
+        ).rowcount
+        if deleted != 1:
+            db.session.rollback()
+            if db.session.get(Review, review_id) is None:
+                return jsonify({"error": "Review not found"}), 404
+            return jsonify({"error": "Review was changed by another request, try again"}), 409
+        adjust_rating(reviewee_id, -rating, -1)
+        db.session.commit()
+        return jsonify({"message": "Review deleted successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@reviews_bp.route("/user/<int:user_id>", methods=["GET"])
+def get_user_reviews(user_id):
+    try:
+        limit = page_size(request.args.get("limit", type=int))
+        query = select(Review).where(Review.reviewee_id == user_id)
+        reviews, next_cursor, has_more = paginate(query, Review, request.args.get("cursor"), limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify({
+        "reviews": reviews_schema.dump(reviews),
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }), 200
+
+
+# Recompute every user's rating aggregates from the reviews table, e.g. after
+# importing reviews or fixing data by hand:
+#   flask --app app reviews repair
+@reviews_bp.cli.command("repair")
+def repair_ratings():
+    review_sum = (
+        select(func.coalesce(func.sum(Review.rating), 0))
+        .where(Review.reviewee_id == User.id)
+        .scalar_subquery()
+    )
+    review_count = (
+        select(func.count(Review.id))
+        .where(Review.reviewee_id == User.id)
+        .scalar_subquery()
+    )
+    review_avg = (
+        select(func.coalesce(func.avg(Review.rating), 0))
+        .where(Review.reviewee_id == User.id)
+        .scalar_subquery()
+    )
+    # A single set-based UPDATE; the database does the aggregation
+    result = db.session.execute(
+        update(User)
+        .values(rating=review_avg, rating_sum=review_sum, rating_count=review_count)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    print(f"Recomputed ratings for {result.rowcount} users.")
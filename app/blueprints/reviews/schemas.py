@@ -0,0 +1,17 @@
+from marshmallow import validate
+from app.extensions import ma
+from app.models import Review
+
+
+class ReviewSchema(ma.SQLAlchemyAutoSchema):
+    class Meta:
+        model = Review
+        include_fk = True
+        dump_only = ('reviewer_id', 'reviewee_id', 'created_at')
+
+    rating = ma.auto_field(required=True, validate=validate.Range(min=1, max=5))
+
+
+review_schema = ReviewSchema()
+reviews_schema = ReviewSchema(many=True)
+review_update_schema = ReviewSchema(partial=True, exclude=('transaction_id',))
@@ -1,6 +1,9 @@
 from flask import request, jsonify
-from app.models import User, Listing, db
+from app.models import User, Listing, Profile, db
 from app.blueprints.search import search_bp
+from sqlalchemy import select, func
+from app.utils.pagination import paginate, page_size
+from app.utils.search import match_listings, match_users
 from .schemas import UserSchema, JobSchema
 
 # Initialize the schemas
@@ -11,40 +14,45 @@ job_schema = JobSchema(many=True)
 @search_bp.route("/search/users", methods=["GET"])
 def search_users():
     query = request.args.get('query', '')  # Search term (e.g., name, email)
-    location = request.args.get('location', '')  # Optional filter by location
-
-    # Filter users based on the query and location
-    user_query = User.query.filter(
-        (User.firstname.ilike(f'%{query}%')) |
-        (User.lastname.ilike(f'%{query}%')) |
-        (User.email.ilike(f'%{query}%')) |
-        (User.location.ilike(f'%{query}%'))
-    )
+    location = request.args.get('location', '')  # Optional filter by profile city or state
+    limit = min(request.args.get('limit', default=10, type=int), 50)
 
+    # Fuzzy match against the trigram index, best matches first
+    user_query = select(User)
     if location:
-        user_query = user_query.filter(User.location.ilike(f'%{location}%'))
+        location = location.strip().lower()
+        user_query = user_query.join(Profile, Profile.user_id == User.id).where(
+            (func.lower(Profile.city) == location) | (func.lower(Profile.state) == location)
+        )
 
-    users = user_query.all()
+    # A location on its own lists the users there
+    matches = match_users(query, max(limit, 1), stmt=user_query if location else None)
 
-    return jsonify([user_schema.dump(user) for user in users])
+    return jsonify([{**user_schema.dump(user), "score": round(score, 3)} for user, score in matches])
 
 # Job Search Route
 @search_bp.route("/search/jobs", methods=["GET"])
 def search_jobs():
     query = request.args.get('query', '')  # Search term (e.g., job title)
-    job_type = request.args.get('job_type', '')  # Job type filter (full-time, part-time)
-    location = request.args.get('location', '')  # Location filter
+    job_type = request.args.get('job_type', '')  # Listing type filter (job, skill_exchange)
+    location = request.args.get('location', '')  # City or state
+    cursor = request.args.get('cursor')
+    limit = page_size(request.args.get('limit', type=int))
 
-    # Basic query for job title matching
-    job_query = Listing.query.filter(Listing.title.ilike(f'%{query}%'))
+    # Title/description terms are looked up in the inverted index
+    job_query = match_listings(select(Listing), text=query, location=location)
 
-    # Add filters for job type and location
     if job_type:
-        job_query = job_query.filter(Listing.job_type.ilike(f'%{job_type}%'))
-    if location:
-        job_query = job_query.filter(Listing.location.ilike(f'%{location}%'))
+        job_query = job_query.where(Listing.type == job_type)
 
-    jobs = job_query.all()
+    try:
+        jobs, next_cursor, has_more = paginate(job_query, Listing, cursor, limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Use job schema to serialize the job data
-    return jsonify([job_schema.dump(job) for job in jobs])
+    return jsonify({
+        "jobs": job_schema.dump(jobs),
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    })
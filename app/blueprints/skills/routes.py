@@ -3,7 +3,10 @@ from app.blueprints.skills import skills_bp
 from marshmallow import ValidationError
 from app.models import Skill, db
 from sqlalchemy import select
-from app.blueprints.skills.schemas import skill_schema, skills_schema
+from app.blueprints.skills.schemas import skill_schema, skills_schema, SkillSchema
+from app.utils.caching import cached_response, invalidate
+from app.utils.fields import requested_fields, sparse_schema, project
+from app.utils.serializers import compiled, dump_many
 
 
 @skills_bp.route("/", methods=["POST"])
@@ -13,6 +16,7 @@ def create_skill():
         new_skill = Skill(name=skill_data["name"], description=skill_data.get("description"))
         db.session.add(new_skill)
         db.session.commit()
+        invalidate("skills")
         return skill_schema.jsonify(new_skill), 201
     except ValidationError as e:
         return jsonify({"errors": e.messages}), 400
@@ -21,9 +25,15 @@ def create_skill():
 
 
 @skills_bp.route("/", methods=["GET"])
+@cached_response("skills")
 def get_skills():
-    query = select(Skill)
+    try:
+        fields = requested_fields(skills_schema)  # ?fields=id,name
+    except ValueError as e:
+        return jsonify({"errors": str(e)}), 400
+
+    query = project(select(Skill), Skill, fields)
     skills = db.session.execute(query).scalars().all()
-    return skills_schema.jsonify(skills), 200
+    return jsonify(dump_many(sparse_schema(SkillSchema, fields), skills)), 200
 
 
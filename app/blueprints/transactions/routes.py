@@ -2,7 +2,11 @@ from app.blueprints.transactions import transactions_bp
 from flask import request, jsonify
 from marshmallow import ValidationError
 from app.models import Transaction, db
-from app.blueprints.transactions.schemas import transactions_schema, transaction_schema
+from sqlalchemy import select
+from app.blueprints.transactions.schemas import transactions_schema, transaction_schema, TransactionSchema
+from app.utils.streaming import wants_stream, stream_query
+from app.utils.fields import requested_fields, sparse_schema, project
+from app.utils.serializers import compiled, dump_many
 
 
 @transactions_bp.route("/", methods=["POST"])
@@ -41,14 +45,23 @@ def get_transactions():
 
     if transaction_id:
         # Fetch a specific transaction by ID
-        transaction = Transaction.query.get(transaction_id)
+        transaction = db.session.get(Transaction, transaction_id)
         if transaction:
             return jsonify(transaction_schema.dump(transaction)), 200
         return jsonify({"error": "Transaction not found"}), 404
 
+    try:
+        fields = requested_fields(transactions_schema)  # ?fields=id,status,...
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
     # Fetch all transactions
-    transactions = Transaction.query.all()
-    return jsonify(transactions_schema.dump(transactions)), 200
+    query = project(select(Transaction), Transaction, fields)
+    if wants_stream():
+        return stream_query(query, compiled(sparse_schema(TransactionSchema, fields)))
+
+    transactions = db.session.execute(query).scalars().all()
+    return jsonify(dump_many(sparse_schema(TransactionSchema, fields), transactions)), 200
 
 
 # [DELETE] - Delete a Transaction by ID
@@ -56,7 +69,7 @@ def get_transactions():
 def delete_transaction(id):
     try:
         # Find the transaction by ID
-        transaction = Transaction.query.get(id)
+        transaction = db.session.get(Transaction, id)
         if not transaction:
             return jsonify({"error": "Transaction not found"}), 404
 
@@ -1,6 +1,6 @@
 from flask import Blueprint
 
 
-users_bp = Blueprint('users_bp', __name__)
+users_bp = Blueprint('users_bp', __name__, cli_group='users')
 
 from . import routes
\ No newline at end of file
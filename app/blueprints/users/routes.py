@@ -4,13 +4,19 @@ from app.blueprints.profile import profile_bp
 from marshmallow import ValidationError
 from app.models import User, db, Profile
 from sqlalchemy import select
-from app.blueprints.users.schemas import user_schema, users_schema, login_schema
+from app.blueprints.users.schemas import user_schema, users_schema, login_schema, user_import_schema, UserSchema
 from app.blueprints.profile.schemas import profile_schema
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.utils.passwords import hash_password, verify_password, PasswordPoolBusy
 from app.models import User
 from app.extensions import limiter
-from app.utils.util import encode_token, token_required
+from app.utils.util import encode_token, token_required, admin_required, invalidate_user_tokens
+from app.utils.search import index_user, unindex_user
+from app.utils.streaming import wants_stream, stream_query
+from app.utils.fields import requested_fields, sparse_schema, project
+from app.utils.serializers import compiled, dump_many
+from app.utils.user_import import read_rows, import_users, FORMATS
 from flask_cors import cross_origin
+import click
 
 # Login schema //token
 
@@ -24,7 +30,18 @@ def login():
     query = select(User).where(User.email == creds['email'])
     user = db.session.execute(query).scalars().first()
 
-    if user and check_password_hash(user.password, creds['password']): 
+    matches = False
+    if user:
+        try:
+            matches, new_hash = verify_password(user.password, creds['password'])
+        except PasswordPoolBusy:
+            return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+        if new_hash:
+            # Hash parameters changed since this password was stored
+            user.password = new_hash
+            db.session.commit()
+
+    if matches:
 
         token = encode_token(user.id)
 
@@ -62,7 +79,7 @@ def create_user():
         #     return jsonify({"message": "User with this email already exists."}), 400
 
         # Hash the password before saving
-        password_hash = generate_password_hash(user_data['password'])  # Hash the password
+        password_hash = hash_password(user_data['password'])  # Hash the password in the worker pool
 
          # Create a new User instance with the hashed password
         new_user = User(
@@ -70,11 +87,12 @@ def create_user():
             lastname=user_data['lastname'],
             email=user_data['email'],
             password=password_hash,  # Store the hashed password in the 'password' field
-            rating=user_data.get('rating', 0)
         )
 
 #         # Add user to the database
         db.session.add(new_user)
+        db.session.flush()
+        index_user(new_user)
         db.session.commit()
 
         token = encode_token(new_user.id)
@@ -91,6 +109,8 @@ def create_user():
             }
         }), 201
     
+    except PasswordPoolBusy:
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -103,10 +123,18 @@ def handle_options():
 
 @users_bp.route("/", methods=["GET"])
 def get_users():
-    query = select(User)
+    try:
+        fields = requested_fields(users_schema)  # ?fields=id,firstname,...
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    query = project(select(User), User, fields)
+    if wants_stream():
+        return stream_query(query, compiled(sparse_schema(UserSchema, fields)))
+
     users = db.session.execute(query).scalars().all()
 
-    return users_schema.jsonify(users), 200
+    return jsonify(dump_many(sparse_schema(UserSchema, fields), users)), 200
 
 @users_bp.route("/<int:user_id>", methods=["GET"])
 def get_user(user_id):
@@ -116,7 +144,10 @@ def get_user(user_id):
 
 @users_bp.route("/<int:user_id>", methods=["PUT"])
 @token_required
-def update_user(user_id):
+def update_user(current_user, user_id):
+    if current_user.id != user_id:
+        return jsonify({'message': 'Unauthorized action'}), 403
+
     user = db.session.get(User, user_id)
 
     if user == None:
@@ -127,9 +158,16 @@ def update_user(user_id):
     except ValidationError as e:
         return jsonify(e.messages), 400
     
+    if 'password' in user_data:
+        try:
+            user_data['password'] = hash_password(user_data['password'])
+        except PasswordPoolBusy:
+            return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+
     for field, value in user_data.items():
         setattr(user, field, value)
 
+    index_user(user)
     db.session.commit()
     return user_schema.jsonify(user), 200
 
@@ -146,7 +184,83 @@ def delete_user(current_user, user_id):
     if user == None:
         return jsonify({'messge': 'invalid id'}), 400
     
+    unindex_user(user.id)
     db.session.delete(user)
     db.session.commit()
+    invalidate_user_tokens(user_id)
     return jsonify({'message': f"deleted user {user_id}!"})
 
+
+
+# Rows per request on the admin endpoint, so one import's hashing (a few
+# seconds) stays well inside a worker timeout; bigger files go through the CLI
+IMPORT_MAX_ROWS = 100
+IMPORT_CONTENT_TYPES = {"text/csv": "csv", "application/x-ndjson": "jsonl", "application/jsonl": "jsonl"}
+
+
+# Bulk import: the body is the file itself, CSV (firstname,lastname,email,password
+# header) or JSON Lines, chosen by Content-Type or ?format=csv|jsonl
+@users_bp.route("/import", methods=["POST"])
+@token_required
+@admin_required
+def bulk_import_users(current_user):
+    fmt = request.args.get("format") or IMPORT_CONTENT_TYPES.get(request.mimetype)
+    if fmt not in FORMATS:
+        return jsonify({"error": "Send text/csv or application/x-ndjson, or pass ?format=csv|jsonl"}), 415
+
+    try:
+        report = import_users(read_rows(request.stream, fmt), user_import_schema, max_rows=IMPORT_MAX_ROWS)
+    except UnicodeDecodeError:
+        return jsonify({"error": "Input must be UTF-8"}), 400
+    except PasswordPoolBusy:
+        return jsonify({"message": "Server busy, please retry"}), 503, {"Retry-After": "1"}
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    return jsonify(report), 200
+
+
+# Import users from a file, hashing passwords on every core:
+#   flask --app app users import members.csv
+@users_bp.cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Defaults to the file extension")
+@click.option("--batch-size", default=1000, show_default=True)
+def import_users_command(path, fmt, batch_size):
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    with open(path, "rb") as f:
+        try:
+            report = import_users(read_rows(f, fmt), user_import_schema, batch_size=batch_size)
+        except PasswordPoolBusy:
+            raise click.ClickException("Password hashing timed out; earlier batches were imported")
+    for error in report["errors"]:
+        print(f"Row {error['row']}: {error['errors']}")
+    print(f"Imported {report['created']} users, {len(report['errors'])} rows failed.")
+
+
+# Account types (e.g. admin) are only ever changed from the server:
+#   flask --app app users set-account-type someone@example.com admin
+@users_bp.cli.command("set-account-type")
+@click.argument("email")
+@click.argument("account_type")
+def set_account_type(email, account_type):
+    profile = db.session.execute(
+        select(Profile).join(User, User.id == Profile.user_id).where(User.email == email)
+    ).scalars().first()
+    if profile is None:
+        raise click.ClickException(f"No profile for {email}")
+    profile.account_type = account_type
+    db.session.commit()
+    print(f"{email} is now {account_type}.")
+
+
+# Rebuild the people-search index for every user:
+#   flask --app app users reindex
+@users_bp.cli.command("reindex")
+def reindex_users():
+    user_ids = db.session.execute(select(User.id)).scalars().all()
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        for user in db.session.execute(select(User).where(User.id.in_(chunk))).scalars():
+            index_user(user)
+        db.session.commit()
+    print(f"Indexed {len(user_ids)} users.")
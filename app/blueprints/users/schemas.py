@@ -1,3 +1,4 @@
+from marshmallow import EXCLUDE, validate
 from app.extensions import ma
 from app.models import User
 
@@ -7,11 +8,29 @@ class UserSchema(ma.SQLAlchemyAutoSchema):
         model = User
         include_fk = True
 
+    password = ma.auto_field(load_only=True)  # Never send the hash back
+    # Maintained from the reviews table, never set directly
+    rating = ma.auto_field(dump_only=True)
+    rating_sum = ma.auto_field(dump_only=True)
+    rating_count = ma.auto_field(dump_only=True)
+
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
 login_schema = UserSchema(exclude=['firstname', 'lastname', 'rating'])
 
 
+class UserImportSchema(ma.SQLAlchemyAutoSchema):
+    # One row of a bulk import; extra columns in the file are ignored
+    class Meta:
+        model = User
+        fields = ('firstname', 'lastname', 'email', 'password')
+        unknown = EXCLUDE
+
+    email = ma.auto_field(validate=[validate.Length(max=100), validate.Email()])
+
+user_import_schema = UserImportSchema()
+
+
 # class RatingSchema(ma.SQLAlchemyAutoSchema):
 #     class Meta:
 #         model = Rating
@@ -2,6 +2,10 @@ from flask_marshmallow import Marshmallow
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from flask_caching import Cache
+import os
+
+if os.name == "posix":
+    import app.utils.ratelimit  # Registers the mmap:// limiter storage
 
 ma = Marshmallow()
 limiter = Limiter(key_func=get_remote_address)
@@ -32,7 +32,9 @@ class User(Base):
     lastname: Mapped[str] = mapped_column(db.String(50), nullable=False)
     email: Mapped[str] = mapped_column(db.String(100), nullable=False, unique=True)
     password: Mapped[str] = mapped_column(db.String(255), nullable=False)
-    rating: Mapped[float] = mapped_column(db.Float, default=0)
+    rating: Mapped[float] = mapped_column(db.Float, default=0)  # rating_sum / rating_count, kept in step by the reviews routes
+    rating_sum: Mapped[int] = mapped_column(default=0, server_default='0')
+    rating_count: Mapped[int] = mapped_column(default=0, server_default='0')
     created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
 
     transactions: Mapped[List['Transaction']] = db.Relationship(back_populates='requester')
@@ -73,10 +75,34 @@ class Listing(Base):
     offered_skill: Mapped[int] = mapped_column(db.ForeignKey('skills.id'), nullable=True)
     wanted_skill: Mapped[int] = mapped_column(db.ForeignKey('skills.id'), nullable=True)
     image: Mapped[str] = mapped_column(db.String(255), nullable=True)  # Path to the uploaded image
+    latitude: Mapped[float] = mapped_column(db.Float, nullable=True)  # ZIP centroid, set on create
+    longitude: Mapped[float] = mapped_column(db.Float, nullable=True)
 
     user: Mapped['User'] = db.Relationship(back_populates='listings')
     transactions: Mapped[List['Transaction']] = db.Relationship(back_populates='listing')
 
+    __table_args__ = (
+        db.Index('ix_listings_lat_lon', 'latitude', 'longitude'),  # Bounding-box prefilter for proximity search
+        db.Index('ix_listings_created_at_id', 'created_at', 'id'),  # Keyset pagination order
+    )
+
+
+
+class ListingTerm(Base):
+    __tablename__ = 'listing_terms'
+
+    # Inverted index: one posting per (term, listing). The primary key orders
+    # postings by term, so exact and prefix lookups are index range scans.
+    term: Mapped[str] = mapped_column(db.String(64), primary_key=True)
+    listing_id: Mapped[int] = mapped_column(db.ForeignKey('listings.id', ondelete="CASCADE"), primary_key=True, index=True)
+
+
+class UserTrigram(Base):
+    __tablename__ = 'user_trigrams'
+
+    # Trigram index over user names and email for fuzzy people search
+    trigram: Mapped[str] = mapped_column(db.String(3), primary_key=True)
+    user_id: Mapped[int] = mapped_column(db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True, index=True)
 
     
 class Transaction(Base):
@@ -108,6 +134,11 @@ class Review(Base):
     reviewer: Mapped['User'] = db.Relationship(foreign_keys=[reviewer_id], back_populates='reviews_given')
     reviewee: Mapped['User'] = db.Relationship(foreign_keys=[reviewee_id], back_populates='reviews_received')
 
+    __table_args__ = (
+        db.UniqueConstraint('transaction_id', 'reviewer_id', name='uq_reviews_transaction_reviewer'),  # One review per side of a transaction
+        db.Index('ix_reviews_reviewee_id', 'reviewee_id'),
+    )
+
 
 
 class Profile(Base):
@@ -143,10 +174,48 @@ class Message(Base):
     created_at: Mapped[datetime] = mapped_column(db.DateTime, default=datetime.utcnow)
     label = db.Column(db.String(50), nullable=True)  # Optional label like "Job Inquiry" or "Skill Exchange"
     reply_to_id: Mapped[int] = mapped_column(db.ForeignKey('messages.id'), nullable=True)
+    thread_id: Mapped[int] = mapped_column(db.ForeignKey('messages.id'), nullable=True)  # Root of the reply chain; its own id for a root
 
     sender: Mapped['User'] = db.relationship("User", foreign_keys=[sender_id])
     recipient: Mapped['User'] = db.relationship("User", foreign_keys=[recipient_id])
     listing: Mapped['Listing'] = db.relationship("Listing", foreign_keys=[listing_id])
     
     
-    reply_to: Mapped['Message'] = db.relationship("Message", remote_side=[id])  # Correct relationship setup
\ No newline at end of file
+    reply_to: Mapped['Message'] = db.relationship("Message", remote_side=[id], foreign_keys=[reply_to_id])  # Correct relationship setup
+
+    __table_args__ = (
+        db.Index('ix_messages_thread_created_at_id', 'thread_id', 'created_at', 'id'),  # Whole thread, in order, from the index
+        db.Index('ix_messages_recipient_created_at_id', 'recipient_id', 'created_at', 'id'),  # Inbox pages
+        db.Index('ix_messages_sender_created_at_id', 'sender_id', 'created_at', 'id'),  # Sent-box pages
+    )
+
+
+
+class Conversation(Base):
+    # Inbox overview, one row per participant: (user_id, peer_id, listing_id)
+    # and its mirror (peer_id, user_id, listing_id). Kept up to date by
+    # save_message in the messages blueprint.
+    __tablename__ = 'conversations'
+
+    user_id: Mapped[int] = mapped_column(db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    peer_id: Mapped[int] = mapped_column(db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    listing_id: Mapped[int] = mapped_column(db.ForeignKey('listings.id', ondelete='CASCADE'), primary_key=True)
+    last_message_id: Mapped[int] = mapped_column(db.ForeignKey('messages.id'), nullable=False)
+    last_activity_at: Mapped[datetime] = mapped_column(db.DateTime, nullable=False)
+    unread_count: Mapped[int] = mapped_column(default=0, server_default='0')  # Messages from the peer not yet read by user_id
+
+    __table_args__ = (
+        db.Index('ix_conversations_user_activity', 'user_id', 'last_activity_at', 'last_message_id'),  # Overview pages, newest first
+    )
+
+
+
+class MessageTerm(Base):
+    __tablename__ = 'message_terms'
+
+    # Per-user inverted index over message content and label: one posting per
+    # (user, term, message) for both the sender and the recipient, so a search
+    # only ever scans the caller's own postings
+    user_id: Mapped[int] = mapped_column(db.ForeignKey('users.id', ondelete="CASCADE"), primary_key=True)
+    term: Mapped[str] = mapped_column(db.String(64), primary_key=True)
+    message_id: Mapped[int] = mapped_column(db.ForeignKey('messages.id', ondelete="CASCADE"), primary_key=True, index=True)
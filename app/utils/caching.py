@@ -0,0 +1,60 @@
+import hashlib
+import time
+from functools import wraps
+from flask import request, make_response, current_app
+from app.extensions import cache
+
+# Tag-based invalidation on top of Flask-Caching. Each tag has a version
+# stored in the cache; a cached response's key embeds the versions of its
+# tags, so bumping a tag's version orphans every response that used it.
+# Orphaned entries simply age out with their timeout. Versions only reach
+# other worker processes through a shared backend (see CACHE_TYPE in config.py).
+
+
+def _tag_key(tag):
+    return f"tag:{tag}"
+
+
+def _tag_versions(tags):
+    keys = [_tag_key(tag) for tag in tags]
+    versions = cache.get_many(*keys)
+    for i, version in enumerate(versions):
+        if version is None:
+            # Unknown or evicted tag: start a fresh version, which also
+            # invalidates anything cached under the old one
+            cache.add(keys[i], time.time_ns(), timeout=0)
+            versions[i] = cache.get(keys[i])
+    return [str(version) for version in versions]
+
+
+def invalidate(*tags):
+    # Call after the write has committed
+    for tag in tags:
+        cache.set(_tag_key(tag), time.time_ns(), timeout=0)
+
+
+def cached_response(*tags, timeout=300):
+    """Cache successful responses of a GET view under entity tags.
+
+    Tags may reference view arguments, e.g. "listing:{listing_id}".
+    The query string is part of the key.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            resolved = [tag.format(**kwargs) for tag in tags]
+            versions = _tag_versions(resolved)
+            digest = hashlib.sha1(f"{request.full_path}|{'|'.join(versions)}".encode()).hexdigest()
+            key = f"view:{func.__module__}.{func.__name__}:{digest}"
+
+            hit = cache.get(key)
+            if hit is not None:
+                body, status, mimetype = hit
+                return current_app.response_class(body, status=status, mimetype=mimetype)
+
+            response = make_response(func(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                cache.set(key, (response.get_data(), response.status_code, response.mimetype), timeout=timeout)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,67 @@
+from sqlalchemy import and_, case, insert, update
+from sqlalchemy.exc import IntegrityError
+from app.models import Conversation, db
+
+# The conversations read model: for every message, both participants' rows
+# for (user, peer, listing) move to the new message, and the recipient's
+# unread count goes up by one. Runs in the message's own transaction.
+
+
+def _row(user_id, peer_id, listing_id):
+    return and_(
+        Conversation.user_id == user_id,
+        Conversation.peer_id == peer_id,
+        Conversation.listing_id == listing_id,
+    )
+
+
+def _advance(user_id, peer_id, listing_id, message, unread):
+    # Relative UPDATE, safe against concurrent senders. A message that lost
+    # the race to an even newer one only bumps the count. last_message_id
+    # goes first so MySQL's left-to-right SET still compares the old time.
+    newer = Conversation.last_activity_at <= message.created_at
+    return db.session.execute(
+        update(Conversation)
+        .where(_row(user_id, peer_id, listing_id))
+        .ordered_values(
+            (Conversation.last_message_id, case((newer, message.id), else_=Conversation.last_message_id)),
+            (Conversation.last_activity_at, case((newer, message.created_at), else_=Conversation.last_activity_at)),
+            (Conversation.unread_count, Conversation.unread_count + unread),
+        )
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def _touch(user_id, peer_id, listing_id, message, unread):
+    if _advance(user_id, peer_id, listing_id, message, unread):
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(insert(Conversation).values(
+                user_id=user_id,
+                peer_id=peer_id,
+                listing_id=listing_id,
+                last_message_id=message.id,
+                last_activity_at=message.created_at,
+                unread_count=unread,
+            ))
+    except IntegrityError:
+        # Another first message for this pair got in between
+        _advance(user_id, peer_id, listing_id, message, unread)
+
+
+def record_message(message):
+    """Fold a flushed message into both participants' conversation rows."""
+    _touch(message.sender_id, message.recipient_id, message.listing_id, message, 0)
+    if message.recipient_id != message.sender_id:
+        _touch(message.recipient_id, message.sender_id, message.listing_id, message, 1)
+
+
+def mark_read(user_id, peer_id, listing_id):
+    # Returns False when there is no such conversation
+    return db.session.execute(
+        update(Conversation)
+        .where(_row(user_id, peer_id, listing_id))
+        .values(unread_count=0)
+        .execution_options(synchronize_session=False)
+    ).rowcount > 0
@@ -0,0 +1,37 @@
+from functools import lru_cache
+from flask import request
+from sqlalchemy import inspect
+from sqlalchemy.orm import load_only
+
+
+def requested_fields(schema):
+    """Field names asked for with ?fields=a,b,c, or None for all of them.
+
+    Only fields the schema dumps are allowed; raises ValueError otherwise.
+    """
+    raw = request.args.get("fields")
+    if not raw:
+        return None
+
+    names = tuple(dict.fromkeys(name.strip() for name in raw.split(",") if name.strip()))
+    dumpable = {name for name, field in schema.fields.items() if not field.load_only}
+    unknown = [name for name in names if name not in dumpable]
+    if unknown or not names:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}; available: {', '.join(sorted(dumpable))}")
+    return names
+
+
+@lru_cache(maxsize=256)
+def sparse_schema(schema_class, fields, many=True):
+    # One schema instance per field combination, built on first use
+    return schema_class(only=fields, many=many)
+
+
+def project(stmt, model, fields, extra=()):
+    # Narrow the SELECT to the requested columns (plus `extra`, e.g. the
+    # keyset pagination key). The primary key is always loaded.
+    if not fields:
+        return stmt
+    columns = inspect(model).column_attrs.keys()
+    wanted = [getattr(model, name) for name in (*fields, *extra) if name in columns]
+    return stmt.options(load_only(*wanted)) if wanted else stmt
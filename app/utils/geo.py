@@ -0,0 +1,158 @@
+import csv
+import os
+from functools import lru_cache
+import numpy as np
+import requests
+
+# Bundled ZIP -> centroid table (zip_code, city, state, latitude, longitude),
+# exported from the MIT-licensed `zipcodes` package.
+ZIP_DATA_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "us_zip_codes.csv")
+
+EARTH_RADIUS_MILES = 3958.8
+
+# Fallback for ZIPs missing from the bundled table
+ZIP_API_URL = "http://api.zippopotam.us/us/{zip_code}"
+ZIP_API_TIMEOUT = 2  # seconds, connect and read
+ZIP_API_CACHE_SIZE = 4096
+
+US_STATE_NAMES = {
+    "AL": "Alabama", "AK": "Alaska", "AZ": "Arizona", "AR": "Arkansas", "CA": "California",
+    "CO": "Colorado", "CT": "Connecticut", "DE": "Delaware", "DC": "District of Columbia",
+    "FL": "Florida", "GA": "Georgia", "HI": "Hawaii", "ID": "Idaho", "IL": "Illinois",
+    "IN": "Indiana", "IA": "Iowa", "KS": "Kansas", "KY": "Kentucky", "LA": "Louisiana",
+    "ME": "Maine", "MD": "Maryland", "MA": "Massachusetts", "MI": "Michigan", "MN": "Minnesota",
+    "MS": "Mississippi", "MO": "Missouri", "MT": "Montana", "NE": "Nebraska", "NV": "Nevada",
+    "NH": "New Hampshire", "NJ": "New Jersey", "NM": "New Mexico", "NY": "New York",
+    "NC": "North Carolina", "ND": "North Dakota", "OH": "Ohio", "OK": "Oklahoma", "OR": "Oregon",
+    "PA": "Pennsylvania", "RI": "Rhode Island", "SC": "South Carolina", "SD": "South Dakota",
+    "TN": "Tennessee", "TX": "Texas", "UT": "Utah", "VT": "Vermont", "VA": "Virginia",
+    "WA": "Washington", "WV": "West Virginia", "WI": "Wisconsin", "WY": "Wyoming",
+    "AS": "American Samoa", "GU": "Guam", "MP": "Northern Mariana Islands", "PR": "Puerto Rico",
+    "VI": "Virgin Islands", "FM": "Federated States of Micronesia", "MH": "Marshall Islands",
+    "PW": "Palau", "AA": "Armed Forces Americas", "AE": "Armed Forces Europe",
+    "AP": "Armed Forces Pacific",
+}
+
+
+class ZipCentroids:
+    # ZIP codes are kept as a sorted int32 array next to parallel float arrays,
+    # so a lookup is a binary search and a batch lookup is one np.searchsorted.
+    def __init__(self, path=ZIP_DATA_PATH):
+        zips, lats, lons, places = [], [], [], []
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                zips.append(int(row["zip_code"]))
+                lats.append(float(row["latitude"]))
+                lons.append(float(row["longitude"]))
+                places.append((row["city"], US_STATE_NAMES.get(row["state"], row["state"])))
+
+        order = np.argsort(zips)
+        self.zips = np.asarray(zips, dtype=np.int32)[order]
+        self.lats = np.asarray(lats, dtype=np.float64)[order]
+        self.lons = np.asarray(lons, dtype=np.float64)[order]
+        self.places = [places[i] for i in order]  # (city, state name)
+
+    def __len__(self):
+        return len(self.zips)
+
+    def lookup(self, zip_code):
+        # Returns (lat, lon) or None for unknown / malformed ZIPs
+        lats, lons, found = self.lookup_many([zip_code])
+        if not found[0]:
+            return None
+        return float(lats[0]), float(lons[0])
+
+    def place(self, zip_code):
+        # Returns (city, state name) or None
+        key = _zip_key(zip_code)
+        i = int(np.searchsorted(self.zips, key))
+        if i < len(self.zips) and self.zips[i] == key:
+            return self.places[i]
+        return None
+
+    def lookup_many(self, zip_codes):
+        # Returns (lats, lons, found) arrays aligned with `zip_codes`
+        keys = np.fromiter((_zip_key(z) for z in zip_codes), dtype=np.int64, count=len(zip_codes))
+        idx = np.searchsorted(self.zips, keys)
+        idx = np.clip(idx, 0, len(self.zips) - 1)
+        found = self.zips[idx] == keys
+        return self.lats[idx], self.lons[idx], found
+
+
+def _zip_key(zip_code):
+    # Accept "02134", "02134-1234" and ints; anything else maps to -1 (never found)
+    digits = str(zip_code or "").strip()[:5]
+    return int(digits) if digits.isdigit() else -1
+
+
+def haversine_miles(lat, lon, lats, lons):
+    # Great-circle distance from one point to many, as a single vectorized pass
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(a))
+
+
+_zip_centroids = None
+
+
+def get_zip_centroids():
+    # Loaded lazily once per process, then shared by every request
+    global _zip_centroids
+    if _zip_centroids is None:
+        _zip_centroids = ZipCentroids()
+    return _zip_centroids
+
+
+@lru_cache(maxsize=ZIP_API_CACHE_SIZE)
+def _remote_place(zip_code):
+    # Only answers (including "no such ZIP") are cached; timeouts and other
+    # request errors propagate and are retried on the next call
+    response = requests.get(ZIP_API_URL.format(zip_code=zip_code), timeout=ZIP_API_TIMEOUT)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    try:
+        place = response.json()["places"][0]
+        return place["place name"], place["state"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return None  # No usable place in the answer: unknown location
+
+
+def lookup_place(zip_code):
+    """Resolve a ZIP to (city, state name), or None if it doesn't exist.
+
+    Served from the bundled table; ZIPs missing from it fall back to the
+    zippopotam.us API with a strict timeout, behind a bounded LRU cache.
+    Raises requests.RequestException if that fallback fails.
+    """
+    zip_code = str(zip_code or "").strip()[:5]
+    if not (len(zip_code) == 5 and zip_code.isdigit()):
+        return None
+
+    place = get_zip_centroids().place(zip_code)
+    if place:
+        return place
+    return _remote_place(zip_code)
+
+
+def bounding_box(lat, lon, radius_miles):
+    # (min_lat, max_lat, min_lon, max_lon) enclosing the radius. It only feeds an
+    # indexed range prefilter; the exact haversine check happens afterwards.
+    angular = radius_miles / EARTH_RADIUS_MILES
+    dlat = np.degrees(angular)
+    ratio = np.sin(angular) / max(np.cos(np.radians(lat)), 1e-9)
+    dlon = np.degrees(np.arcsin(ratio)) if ratio < 1 else 180.0
+    return float(lat - dlat), float(lat + dlat), float(lon - dlon), float(lon + dlon)
+
+
+def filter_within_radius(items, lat, lon, radius_miles, coords=lambda item: (item.latitude, item.longitude)):
+    # Keep the items whose (lat, lon) lies within `radius_miles` of the origin.
+    # Items without coordinates are dropped.
+    if not items:
+        return []
+
+    points = np.array([coords(item) for item in items], dtype=np.float64)
+    distances = haversine_miles(lat, lon, points[:, 0], points[:, 1])
+    keep = distances <= radius_miles  # NaN (missing coordinates) compares False
+    return [item for item, ok in zip(items, keep) if ok]
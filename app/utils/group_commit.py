@@ -0,0 +1,105 @@
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+from app.models import db
+
+# Write-behind group commit. Request threads hand their rows to a bounded
+# queue and wait on a future; one flusher thread writes whatever has piled
+# up (up to max_batch, or what arrives within max_wait of the first item) in
+# one transaction, so a burst of N writes costs one commit instead of N.
+# Futures resolve only after the commit, so a caller never acknowledges a
+# row that isn't durable.
+
+
+class GroupCommitBusy(Exception):
+    pass
+
+
+class GroupCommitPending(Exception):
+    # The wait timed out after the flusher took the item: it may still commit
+    pass
+
+
+class GroupCommitter:
+    def __init__(self, app, write, max_batch=100, max_wait=0.005, max_queue=1000):
+        # write(item) adds one item to db.session (flushing as needed) and
+        # returns the value its future resolves to after the commit
+        self.app = app
+        self.write = write
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def submit(self, item):
+        # Raises GroupCommitBusy instead of letting the queue grow without bound
+        self._ensure_started()
+        future = Future()
+        try:
+            self.queue.put_nowait((item, future))
+        except queue.Full:
+            raise GroupCommitBusy()
+        return future
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="group-commit", daemon=True)
+                self.thread.start()
+
+    def wait(self, future, timeout):
+        """Result of a submitted item, waiting at most `timeout` seconds.
+
+        On timeout the item is withdrawn if the flusher hasn't taken it yet
+        (GroupCommitBusy: nothing was written, safe to retry); otherwise
+        GroupCommitPending, since it may still commit.
+        """
+        try:
+            return future.result(timeout=timeout)
+        except TimeoutError:
+            if future.cancel():
+                raise GroupCommitBusy()
+            raise GroupCommitPending()
+
+    def _next_batch(self):
+        batch = []
+        while len(batch) < self.max_batch:
+            try:
+                item = self.queue.get(timeout=self.max_wait) if batch else self.queue.get()
+            except queue.Empty:
+                break
+            # Claims the item; False when its caller already gave up on it
+            if item[1].set_running_or_notify_cancel():
+                batch.append(item)
+        return batch
+
+    def _run(self):
+        with self.app.app_context():
+            while True:
+                batch = self._next_batch()
+                if not batch:
+                    continue
+                try:
+                    self._flush(batch)
+                finally:
+                    db.session.remove()
+
+    def _flush(self, batch):
+        try:
+            results = [self.write(item) for item, _ in batch]
+            db.session.commit()
+        except Exception:
+            # One bad row shouldn't fail its neighbours: retry them one by one
+            db.session.rollback()
+            for item, future in batch:
+                try:
+                    result = self.write(item)
+                    db.session.commit()
+                    future.set_result(result)
+                except Exception as e:
+                    db.session.rollback()
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
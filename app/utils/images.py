@@ -0,0 +1,81 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from flask import request, send_from_directory
+from PIL import Image
+from app.utils.uploads import STORED_NAME_RE
+
+# Longest edge in pixels for each generated variant
+VARIANTS = {"thumb": 256, "preview": 1024}
+WEBP_QUALITY = 80
+ONE_YEAR = 365 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+# Variant generation runs off the request path; Pillow releases the GIL
+# while resizing and encoding, so a small thread pool is enough
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image-variants")
+
+
+def variant_name(filename, size):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}.{size}.webp"
+
+
+def _generate_variants(directory, filename):
+    source = os.path.join(directory, filename)
+    try:
+        with Image.open(source) as original:
+            original.load()
+            for size, edge in VARIANTS.items():
+                target = os.path.join(directory, variant_name(filename, size))
+                if os.path.exists(target):
+                    continue
+                image = original.copy()
+                image.thumbnail((edge, edge))
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA")
+                # Write to a temp file and rename, so a half-written variant is never served
+                fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".variant-")
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, "WEBP", quality=WEBP_QUALITY)
+                os.replace(tmp_path, target)
+    except Exception as e:
+        logger.warning("Failed to generate image variants for %s: %s", filename, e)
+
+
+def schedule_variants(directory, filename):
+    # Fire and forget; until the variants exist the original is served
+    return _executor.submit(_generate_variants, directory, filename)
+
+
+def send_image(directory, filename, size=None):
+    """Serve an uploaded image, or its `size` variant when available.
+
+    Content-addressed files never change, so they get a strong ETag and an
+    immutable year-long Cache-Control. Range requests are handled by
+    send_from_directory's conditional mode.
+    """
+    directory = os.path.abspath(directory)  # Flask resolves relative paths against the app package
+    immutable = bool(STORED_NAME_RE.match(filename))
+    served = filename
+
+    if size in VARIANTS and immutable:
+        candidate = variant_name(filename, size)
+        if "image/webp" in request.headers.get("Accept", "") and os.path.exists(os.path.join(directory, candidate)):
+            served = candidate
+        else:
+            # Variant pending or not acceptable: don't pin the original to this URL
+            immutable = False
+
+    if immutable:
+        response = send_from_directory(directory, served, etag=os.path.splitext(served)[0], max_age=ONE_YEAR)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response = send_from_directory(directory, served, max_age=60)
+
+    if size:
+        response.vary.add("Accept")
+    return response
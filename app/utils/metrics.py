@@ -0,0 +1,87 @@
+import os
+import time
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Request metrics per endpoint ("blueprint.view"), served in Prometheus text
+# format at /metrics. With several worker processes, set PROMETHEUS_MULTIPROC_DIR
+# to an empty directory shared by the workers before they start; each process
+# then writes its samples to mmap'd files there and /metrics sums them all.
+# The process manager must also call multiprocess.mark_process_dead(pid) when
+# a worker exits, or the in-flight gauge keeps counting that worker's last
+# values; gunicorn.conf.py at the repository root does it for gunicorn.
+
+# Fixed buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by endpoint",
+    ["endpoint", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_COUNT = Counter(
+    "http_requests",
+    "Responses by endpoint and status code",
+    ["endpoint", "method", "status"],
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+    ["endpoint"],
+    multiprocess_mode="livesum",
+)
+
+
+def _endpoint():
+    # Unmatched URLs share one label so 404 scans can't blow up cardinality
+    return request.url_rule.endpoint if request.url_rule else "unmatched"
+
+
+def _start():
+    g.metrics_endpoint = _endpoint()
+    g.metrics_started = time.perf_counter()
+    IN_FLIGHT.labels(g.metrics_endpoint).inc()
+
+
+def _record_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish(exc):
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    endpoint = g.metrics_endpoint
+    status = g.get("metrics_status", 500)
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started)
+    REQUEST_COUNT.labels(endpoint, request.method, str(status)).inc()
+    IN_FLIGHT.labels(endpoint).dec()
+
+
+def metrics():
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    # Registered before the other extensions so requests they reject
+    # (e.g. rate limited) are still counted
+    app.before_request(_start)
+    app.after_request(_record_status)
+    app.teardown_request(_finish)
+    app.add_url_rule("/metrics", "metrics", metrics)
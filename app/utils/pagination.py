@@ -0,0 +1,69 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.models import db
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at, row_id):
+    # Opaque to clients: url-safe base64 of the (created_at, id) sort key
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def page_size(requested):
+    if not requested or requested < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(requested, MAX_PAGE_SIZE)
+
+
+def paginate(stmt, model, cursor=None, limit=DEFAULT_PAGE_SIZE, keep=None, scalars=True, order_by=None):
+    """Keyset pagination over `stmt` ordered by (created_at, id) descending,
+    or by the (timestamp, unique id) column pair in `order_by`.
+
+    `keep` optionally filters each fetched batch in Python (e.g. an exact
+    distance check); batches are fetched until the page is full. With
+    scalars=False the rows are tuples whose first entity is `model`. Returns
+    (rows, next_cursor, has_more). Raises ValueError for a bad cursor.
+    """
+    time_column, id_column = order_by or (model.created_at, model.id)
+
+    def sort_key(row):
+        obj = row if scalars else row[0]
+        return getattr(obj, time_column.key), getattr(obj, id_column.key)
+
+    after = decode_cursor(cursor) if cursor else None
+    ordered = stmt.order_by(time_column.desc(), id_column.desc()).limit(limit + 1)
+
+    rows = []
+    while True:
+        batch_stmt = ordered
+        if after:
+            batch_stmt = batch_stmt.where(or_(
+                time_column < after[0],
+                and_(time_column == after[0], id_column < after[1]),
+            ))
+        result = db.session.execute(batch_stmt)
+        batch = (result.scalars() if scalars else result).all()
+        rows.extend(keep(batch) if keep else batch)
+
+        if len(rows) > limit or len(batch) <= limit:
+            break
+        after = sort_key(batch[-1])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(*sort_key(rows[-1])) if has_more else None
+    return rows, next_cursor, has_more
@@ -0,0 +1,168 @@
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# Hashes are computed with this method; stored hashes using anything else
+# are upgraded on the next successful login
+PASSWORD_HASH_METHOD = "scrypt:32768:8:1"
+
+# PASSWORD_HASH_WORKERS = 0 in the app config hashes inline (no pool)
+DEFAULT_WORKERS = os.cpu_count() or 1
+HASH_TIMEOUT = 10  # seconds
+# Jobs allowed to wait per worker (PASSWORD_HASH_QUEUE in the app config
+# overrides the total). The bound is on waiting time, not concurrency: at
+# roughly 0.1 s per scrypt hash a worker clears 32 jobs in about 3 s, well
+# inside HASH_TIMEOUT, so ordinary bursts queue instead of getting 503s.
+QUEUE_PER_WORKER = 32
+BULK_CHUNK = 16  # passwords per task when hashing in bulk
+
+
+class PasswordPoolBusy(Exception):
+    # Too many jobs waiting, or one didn't finish within HASH_TIMEOUT
+    pass
+
+
+_pool = None
+_pending = None
+_pool_lock = threading.Lock()
+
+
+def _workers():
+    return current_app.config.get("PASSWORD_HASH_WORKERS", DEFAULT_WORKERS)
+
+
+def _queue_size(workers):
+    return current_app.config.get("PASSWORD_HASH_QUEUE") or workers * QUEUE_PER_WORKER
+
+
+def _get_pool(workers):
+    # Created on first use, and again after a worker died and broke the
+    # pool. "spawn" keeps the children free of the server's threads and open
+    # connections.
+    global _pool, _pending
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        if _pending is None:
+            _pending = threading.BoundedSemaphore(_queue_size(workers))
+    return _pool
+
+
+def _discard_pool(pool):
+    # The next _get_pool() starts a fresh one; other threads may have
+    # replaced it already
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def _submit(pool, func, *args):
+    # The slot is held until the job itself finishes, not until its caller
+    # stops waiting, so timed-out jobs still count against the limit
+    try:
+        future = pool.submit(func, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def _run(func, *args):
+    # KDFs hold the GIL for their whole run, so they go to other processes.
+    # At most _queue_size() jobs wait; past that callers get
+    # PasswordPoolBusy instead of piling up behind the queue.
+    workers = _workers()
+    if not workers:
+        return func(*args)
+
+    for attempt in range(2):
+        pool = _get_pool(workers)
+        if not _pending.acquire(blocking=False):
+            raise PasswordPoolBusy()
+        try:
+            return _submit(pool, func, *args).result(timeout=HASH_TIMEOUT)
+        except TimeoutError as e:
+            raise PasswordPoolBusy() from e
+        except BrokenProcessPool:
+            # Hashing is idempotent: retry once on a fresh pool
+            _discard_pool(pool)
+            if attempt:
+                raise
+
+
+def _hash(password):
+    return generate_password_hash(password, method=PASSWORD_HASH_METHOD)
+
+
+def _verify(stored_hash, password):
+    if not check_password_hash(stored_hash, password):
+        return False, None
+    # Same worker, same trip: rehash if the parameters have changed
+    if stored_hash.split("$", 1)[0] != PASSWORD_HASH_METHOD:
+        return True, _hash(password)
+    return True, None
+
+
+def hash_password(password):
+    return _run(_hash, password)
+
+
+def verify_password(stored_hash, password):
+    """Returns (matches, new_hash); new_hash is set when the stored hash
+    uses outdated parameters and should be replaced."""
+    return _run(_verify, stored_hash, password)
+
+
+def _hash_chunk(passwords):
+    return [_hash(password) for password in passwords]
+
+
+def _chunk_result(future):
+    try:
+        return future.result(timeout=HASH_TIMEOUT)
+    except TimeoutError as e:
+        raise PasswordPoolBusy() from e
+
+
+def hash_passwords(passwords):
+    """Hash a list of passwords across the pool, in input order.
+
+    Meant for bulk imports. Only one chunk per worker is queued at a time,
+    so logins submitted meanwhile wait behind at most one chunk, not the
+    whole import. Each queued chunk holds one PasswordPoolBusy slot, and
+    like a single hash, raises PasswordPoolBusy when no slot is free or a
+    chunk takes longer than HASH_TIMEOUT.
+    """
+    workers = _workers()
+    if not workers:
+        return _hash_chunk(passwords)
+
+    pool = _get_pool(workers)
+    chunks = (passwords[i:i + BULK_CHUNK] for i in range(0, len(passwords), BULK_CHUNK))
+    pending = deque()
+    hashes = []
+    try:
+        for chunk in chunks:
+            if len(pending) >= workers:
+                hashes.extend(_chunk_result(pending.popleft()))
+            if not _pending.acquire(blocking=False):
+                raise PasswordPoolBusy()
+            pending.append(_submit(pool, _hash_chunk, chunk))
+        while pending:
+            hashes.extend(_chunk_result(pending.popleft()))
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        # Chunks nobody will collect shouldn't keep the pool busy
+        for future in pending:
+            future.cancel()
+    return hashes
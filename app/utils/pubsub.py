@@ -0,0 +1,213 @@
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from urllib.parse import urlparse
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Publish/subscribe for pushing events to connected clients (see the
+# /messages/stream SSE endpoint). Subscribers live in the worker process that
+# holds their connection; the backend decides how a publish reaches them:
+#
+#   PUBSUB_URL = "memory://"            single process, delivered in place
+#   PUBSUB_URL = "tcp://127.0.0.1:6390" several workers, relayed by the broker
+#                                       from `flask messages broker`
+#
+# The TCP broker is a local stand-in for Redis pub/sub and the like: it sends
+# every line it receives to every connected worker, the sender included.
+
+SUBSCRIBER_QUEUE_SIZE = 100
+RECONNECT_DELAY = 1  # seconds
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBackend:
+    def start(self, deliver):
+        self.deliver = deliver
+
+    def publish(self, channel, payload):
+        self.deliver(channel, payload)
+
+
+class TcpBackend:
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.sock = None
+        self.send_lock = threading.Lock()
+
+    def start(self, deliver):
+        self.deliver = deliver
+        threading.Thread(target=self._read_loop, name="pubsub-tcp", daemon=True).start()
+
+    def _read_loop(self):
+        # Keeps one connection to the broker up, reconnecting as needed
+        while True:
+            try:
+                sock = socket.create_connection(self.address)
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with self.send_lock:
+                    self.sock = sock
+                for line in sock.makefile("rb"):
+                    channel, payload = json.loads(line)
+                    self.deliver(channel, payload)
+            except (OSError, ValueError) as e:
+                logger.warning("Pub/sub broker connection lost: %s", e)
+            with self.send_lock:
+                self.sock = None
+            time.sleep(RECONNECT_DELAY)
+
+    def publish(self, channel, payload):
+        line = json.dumps([channel, payload]).encode() + b"\n"
+        with self.send_lock:
+            if self.sock is None:
+                # Nothing queues up while the broker is away; clients catch up
+                # from the database when they reconnect
+                logger.warning("Pub/sub broker unavailable, dropped event for %s", channel)
+                return
+            try:
+                self.sock.sendall(line)
+            except OSError as e:
+                logger.warning("Pub/sub publish failed: %s", e)
+
+
+def make_backend(url):
+    parsed = urlparse(url or "memory://")
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "tcp":
+        return TcpBackend(parsed.hostname or "127.0.0.1", parsed.port or 6390)
+    raise ValueError(f"Unsupported PUBSUB_URL: {url}")
+
+
+class Subscription:
+    def __init__(self, hub, channel):
+        self.hub = hub
+        self.channel = channel
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout):
+        # Next payload, or None if nothing arrived within `timeout` seconds
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.hub._unsubscribe(self)
+
+
+class Hub:
+    def __init__(self):
+        self.url = None
+        self.backend = None
+        self.pid = None
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        # The first app's PUBSUB_URL wins, whatever the number of apps created
+        if self.url is None:
+            self.url = app.config.get("PUBSUB_URL") or "memory://"
+
+    def _backend(self):
+        # Started on first use in each process rather than in create_app: a
+        # worker forked from a preloaded app would otherwise inherit the
+        # parent's socket and a reader thread that doesn't exist in it
+        if self.pid != os.getpid():
+            with self.lock:
+                if self.pid != os.getpid():
+                    self.subscribers = {}
+                    self.backend = make_backend(self.url)
+                    self.backend.start(self._deliver)
+                    self.pid = os.getpid()
+        return self.backend
+
+    def subscribe(self, channel):
+        self._backend()
+        subscription = Subscription(self, channel)
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscribers.get(subscription.channel)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscribers[subscription.channel]
+
+    def _deliver(self, channel, payload):
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(payload)
+            except queue.Full:
+                pass  # Stalled client; it catches up on reconnect
+
+    def publish(self, channel, payload):
+        self._backend().publish(channel, payload)
+
+    def publish_after_commit(self, session, channel, payload):
+        # Queued on the session and sent only once its transaction commits,
+        # so subscribers never hear about rows that were rolled back
+        session.info.setdefault("pubsub_pending", []).append((channel, payload))
+
+
+hub = Hub()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for channel, payload in session.info.pop("pubsub_pending", ()):
+        hub.publish(channel, payload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    # A savepoint rolling back leaves the outer transaction's events queued
+    if previous_transaction.parent is None:
+        session.info.pop("pubsub_pending", None)
+
+
+class _BrokerHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        with server.clients_lock:
+            server.clients[self.wfile] = threading.Lock()  # One writer at a time per client
+        try:
+            for line in self.rfile:
+                with server.clients_lock:
+                    clients = list(server.clients.items())
+                for client, write_lock in clients:
+                    try:
+                        with write_lock:
+                            client.write(line)
+                            client.flush()
+                    except OSError:
+                        pass
+        finally:
+            with server.clients_lock:
+                server.clients.pop(self.wfile, None)
+
+
+class _BrokerServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, _BrokerHandler)
+        self.clients = {}
+        self.clients_lock = threading.Lock()
+
+
+def run_broker(host="127.0.0.1", port=6390):
+    with _BrokerServer((host, port)) as server:
+        server.serve_forever()
@@ -0,0 +1,80 @@
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Per-request SQL accounting. Every statement run inside a request is counted
+# and timed through engine events; the same statement text repeating
+# QUERY_REPEAT_THRESHOLD times or more is reported as a likely N+1 (a lazy
+# load inside a loop). In debug mode the numbers go out as response headers;
+# repeats are also logged as a warning, which is what production relies on.
+
+DEFAULT_REPEAT_THRESHOLD = 5
+
+
+class QueryStats:
+    __slots__ = ("count", "seconds", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def repeated(self, threshold):
+        return [(statement, n) for statement, n in self.statements.most_common() if n >= threshold]
+
+
+def _stats():
+    if not has_request_context():
+        return None
+    stats = g.get("query_stats")
+    if stats is None:
+        stats = g.query_stats = QueryStats()
+    return stats
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _stats()
+    if stats is not None:
+        stats.count += 1
+        stats.seconds += time.perf_counter() - context._query_started
+        stats.statements[statement] += 1
+
+
+def _report(response):
+    stats = g.get("query_stats")
+    if stats is None:
+        return response
+
+    threshold = current_app.config.get("QUERY_REPEAT_THRESHOLD", DEFAULT_REPEAT_THRESHOLD)
+    repeated = stats.repeated(threshold)
+
+    if current_app.debug:
+        response.headers["X-Query-Count"] = str(stats.count)
+        response.headers["X-Query-Time-Ms"] = f"{stats.seconds * 1000:.1f}"
+        if repeated:
+            # Statement texts can be long; the header carries counts only
+            response.headers["X-Query-N-Plus-One"] = ", ".join(str(n) for _, n in repeated)
+    if repeated:
+        current_app.logger.warning(
+            "Possible N+1 on %s %s: %d queries in %.1f ms; repeated: %s",
+            request.method,
+            request.path,
+            stats.count,
+            stats.seconds * 1000,
+            "; ".join(f"{n}x {' '.join(statement.split())[:200]}" for statement, n in repeated),
+        )
+    return response
+
+
+def init_query_stats(app):
+    # Engine-class listeners cover every engine, including ones created later
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.after_request(_report)
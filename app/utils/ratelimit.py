@@ -0,0 +1,184 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+from urllib.parse import urlparse, parse_qs
+from limits.storage import Storage
+
+# Rate-limit counters shared by every worker process on the host through one
+# memory-mapped file: RATELIMIT_STORAGE_URI = "mmap:///path/to/file?slots=65536"
+#
+# The file is an open-addressing hash table split into shards. An update
+# locks only its shard: a byte-range fcntl lock across processes plus a
+# threading.Lock within one (fcntl locks don't exclude threads of the same
+# process). Counters are read and written in place, so there is no network
+# round trip and no serialization.
+
+MAGIC = b"RLMMAP01"
+HEADER = struct.Struct("<8sII")  # magic, slots, shards
+SLOT = struct.Struct("<QqdQ")  # key hash, count, expiry (epoch seconds), unused
+DEFAULT_SLOTS = 65536
+DEFAULT_SHARDS = 64
+MAX_PROBE = 32  # Slots examined per lookup
+
+
+def _key_hash(key):
+    # 0 marks an empty slot
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+
+class MmapStorage(Storage):
+    STORAGE_SCHEME = ["mmap"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        parsed = urlparse(uri)
+        params = parse_qs(parsed.query)
+        self.path = parsed.path
+        slots = int(params.get("slots", [DEFAULT_SLOTS])[0])
+        shards = int(params.get("shards", [DEFAULT_SHARDS])[0])
+
+        # Never follow a symlink planted at the path, and never adopt a file
+        # someone else created there
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        if os.fstat(self.fd).st_uid != os.getuid():
+            os.close(self.fd)
+            raise PermissionError(f"Rate-limit file {self.path} is owned by another user")
+        try:
+            self._init_file(slots - slots % shards, shards)
+        except Exception:
+            os.close(self.fd)
+            raise
+        self.map = mmap.mmap(self.fd, HEADER.size + self.slots * SLOT.size)
+        self.slots_per_shard = self.slots // self.shards
+        self.thread_locks = [threading.Lock() for _ in range(self.shards)]
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    def _init_file(self, slots, shards):
+        # First process to get here sizes the file; the rest adopt its layout.
+        # Only an empty file is initialized: anything else without our header
+        # is not ours to overwrite.
+        fcntl.lockf(self.fd, fcntl.LOCK_EX)
+        try:
+            header = os.pread(self.fd, HEADER.size, 0)
+            if len(header) == HEADER.size and header[:8] == MAGIC:
+                _, self.slots, self.shards = HEADER.unpack(header)
+            elif not header:
+                self.slots, self.shards = slots, shards
+                os.pwrite(self.fd, HEADER.pack(MAGIC, slots, shards), 0)
+            else:
+                raise ValueError(f"{self.path} is not a rate-limit file; refusing to overwrite it")
+            # Zeroed slots are empty, so growing the file is always safe (and
+            # completes an initialization that was cut short)
+            size = HEADER.size + self.slots * SLOT.size
+            if os.fstat(self.fd).st_size < size:
+                os.ftruncate(self.fd, size)
+        finally:
+            fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    #=== shard locking ===
+
+    def _shard_range(self, shard):
+        start = HEADER.size + shard * self.slots_per_shard * SLOT.size
+        return start, self.slots_per_shard * SLOT.size
+
+    def _locked(self, key):
+        key_hash = _key_hash(key)
+        shard = key_hash % self.shards
+        return _ShardLock(self, shard), key_hash, shard
+
+    def _find(self, key_hash, shard, now, create):
+        # Linear probe inside the shard, bounded by MAX_PROBE: a key is only
+        # ever stored within MAX_PROBE slots of its start, so a miss costs at
+        # most that many reads however full the shard is. Expired and cleared
+        # slots keep their hash so probe chains stay intact; they are reused
+        # for new keys.
+        base = HEADER.size + shard * self.slots_per_shard * SLOT.size
+        start = (key_hash // self.shards) % self.slots_per_shard
+        reusable = None
+        oldest = None
+        for i in range(min(MAX_PROBE, self.slots_per_shard)):
+            offset = base + ((start + i) % self.slots_per_shard) * SLOT.size
+            slot_hash, count, expiry, _ = SLOT.unpack_from(self.map, offset)
+            if slot_hash == key_hash:
+                return offset, count if expiry > now else 0, expiry if expiry > now else 0.0
+            if slot_hash == 0:
+                return (reusable or offset, 0, 0.0) if create else (None, 0, 0.0)
+            if reusable is None and expiry <= now:
+                reusable = offset
+            if oldest is None or expiry < oldest[1]:
+                oldest = (offset, expiry)
+        if not create:
+            return None, 0, 0.0
+        # Probe window full of live keys: evict the one closest to expiring
+        return reusable or oldest[0], 0, 0.0
+
+    #=== Storage API ===
+
+    def incr(self, key, expiry, elastic_expiry=False, amount=1):
+        lock, key_hash, shard = self._locked(key)
+        with lock:
+            now = time.time()
+            offset, count, expires_at = self._find(key_hash, shard, now, create=True)
+            if count == 0 or elastic_expiry:
+                expires_at = now + expiry
+            count += amount
+            SLOT.pack_into(self.map, offset, key_hash, count, expires_at, 0)
+            return count
+
+    def get(self, key):
+        lock, key_hash, shard = self._locked(key)
+        with lock:
+            return self._find(key_hash, shard, time.time(), create=False)[1]
+
+    def get_expiry(self, key):
+        lock, key_hash, shard = self._locked(key)
+        with lock:
+            now = time.time()
+            expires_at = self._find(key_hash, shard, now, create=False)[2]
+            return int(expires_at or now)
+
+    def clear(self, key):
+        lock, key_hash, shard = self._locked(key)
+        with lock:
+            offset = self._find(key_hash, shard, time.time(), create=False)[0]
+            if offset is not None:
+                SLOT.pack_into(self.map, offset, key_hash, 0, 0.0, 0)
+
+    def reset(self):
+        cleared = 0
+        for shard in range(self.shards):
+            with _ShardLock(self, shard):
+                start, length = self._shard_range(shard)
+                cleared += sum(
+                    1 for offset in range(start, start + length, SLOT.size)
+                    if SLOT.unpack_from(self.map, offset)[0]
+                )
+                self.map[start:start + length] = bytes(length)
+        return cleared
+
+    def check(self):
+        return not self.map.closed
+
+
+class _ShardLock:
+    def __init__(self, storage, shard):
+        self.storage = storage
+        self.shard = shard
+
+    def __enter__(self):
+        start, length = self.storage._shard_range(self.shard)
+        self.storage.thread_locks[self.shard].acquire()
+        fcntl.lockf(self.storage.fd, fcntl.LOCK_EX, length, start)
+        return self
+
+    def __exit__(self, *exc):
+        start, length = self.storage._shard_range(self.shard)
+        fcntl.lockf(self.storage.fd, fcntl.LOCK_UN, length, start)
+        self.storage.thread_locks[self.shard].release()
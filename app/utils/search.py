@@ -0,0 +1,202 @@
+import math
+import re
+import unicodedata
+from sqlalchemy import select, delete, insert, func, or_, case, literal
+from app.models import db, Listing, ListingTerm, MessageTerm, User, UserTrigram
+
+TOKEN_RE = re.compile(r"\w+")
+MAX_TERM_LENGTH = 64
+
+
+def words(text):
+    # Casefolded word runs in any script, after NFKC so composed and
+    # decomposed forms (and e.g. full-width letters) give the same words
+    return TOKEN_RE.findall(unicodedata.normalize("NFKC", text or "").casefold())
+
+
+def tokenize(text):
+    # Words, deduplicated, in first-seen order
+    seen = {}
+    for token in words(text):
+        seen.setdefault(token[:MAX_TERM_LENGTH], None)
+    return list(seen)
+
+
+#=== LISTINGS ===
+
+def listing_terms(listing):
+    # Free-text terms from title/description, plus field-qualified location
+    # terms so city/state filters are answered from the same index
+    terms = set(tokenize(f"{listing.title} {listing.description or ''}"))
+    terms.update(f"city:{token}" for token in tokenize(listing.city))
+    terms.update(f"state:{token}" for token in tokenize(listing.state))
+    return {term[:MAX_TERM_LENGTH] for term in terms}
+
+
+def index_listing(listing):
+    # Call inside the listing's transaction; the listing must have an id (flush first)
+    unindex_listing(listing.id)
+    db.session.add_all(ListingTerm(term=term, listing_id=listing.id) for term in listing_terms(listing))
+
+
+def unindex_listing(listing_id):
+    db.session.execute(delete(ListingTerm).where(ListingTerm.listing_id == listing_id))
+
+
+def _postings_all(terms):
+    # Listing ids present in every term's posting list
+    return (
+        select(ListingTerm.listing_id)
+        .where(ListingTerm.term.in_(terms))
+        .group_by(ListingTerm.listing_id)
+        .having(func.count(ListingTerm.term) == len(terms))
+    )
+
+
+def _postings_prefix(prefix):
+    # Free-text terms only: "st" must not match every "state:..." posting
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return select(ListingTerm.listing_id).where(
+        ListingTerm.term.like(f"{escaped}%", escape="\\"),
+        ~ListingTerm.term.contains(":"),
+    )
+
+
+def match_listings(stmt, text=None, city=None, state=None, location=None, prefix=True):
+    """Restrict a `select(Listing)` to listings matching every search term.
+
+    With `prefix`, the last word of `text` matches as a prefix so results
+    stay useful while the user is still typing it. `location` matches
+    either the city or the state.
+    """
+    words = tokenize(text)
+    last = words.pop() if prefix and words else None
+
+    exact = set(words)
+    exact.update(f"city:{token}" for token in tokenize(city))
+    exact.update(f"state:{token}" for token in tokenize(state))
+    exact = {term[:MAX_TERM_LENGTH] for term in exact}
+
+    if exact:
+        stmt = stmt.where(Listing.id.in_(_postings_all(sorted(exact))))
+    if last:
+        stmt = stmt.where(Listing.id.in_(_postings_prefix(last)))
+
+    location_tokens = tokenize(location)
+    if location_tokens:
+        stmt = stmt.where(or_(
+            Listing.id.in_(_postings_all([f"city:{token}"[:MAX_TERM_LENGTH] for token in location_tokens])),
+            Listing.id.in_(_postings_all([f"state:{token}"[:MAX_TERM_LENGTH] for token in location_tokens])),
+        ))
+    return stmt
+
+
+#=== USERS ===
+
+MIN_SIMILARITY = 0.3
+
+
+def trigrams(text):
+    # pg_trgm style: each word is padded with two leading and one trailing
+    # space, so short words and word starts still produce trigrams
+    grams = set()
+    for word in words(text):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def user_trigrams(user):
+    # Only the local part of the email; domains like "gmail com" would put
+    # almost every user on the same posting lists
+    local_part = (user.email or "").split("@")[0]
+    return trigrams(f"{user.firstname} {user.lastname} {local_part}")
+
+
+def index_user(user):
+    # Call inside the user's transaction; the user must have an id (flush first)
+    unindex_user(user.id)
+    db.session.add_all(UserTrigram(trigram=gram, user_id=user.id) for gram in user_trigrams(user))
+
+
+def unindex_user(user_id):
+    db.session.execute(delete(UserTrigram).where(UserTrigram.user_id == user_id))
+
+
+def match_users(text, limit, stmt=None):
+    """Top-`limit` users by trigram overlap with `text`, best first.
+
+    Similarity is the share of the query's trigrams found on the user, so a
+    typo only costs the few trigrams it touches. Returns [(user, score)].
+    When `text` has no words, the first `limit` users of `stmt` (if given)
+    match with score 0, e.g. for a location-only search.
+    """
+    query_grams = trigrams(text)
+    if not query_grams:
+        if stmt is None:
+            return []
+        return [(user, 0.0) for user in db.session.scalars(stmt.order_by(User.id).limit(limit))]
+
+    shared = func.count(UserTrigram.trigram).label("shared")
+    candidates = (
+        select(UserTrigram.user_id, shared)
+        .where(UserTrigram.trigram.in_(query_grams))
+        .group_by(UserTrigram.user_id)
+        .having(shared >= max(1, math.ceil(MIN_SIMILARITY * len(query_grams))))
+        .subquery()
+    )
+
+    stmt = stmt if stmt is not None else select(User)
+    stmt = (
+        stmt.add_columns(candidates.c.shared)
+        .join(candidates, candidates.c.user_id == User.id)
+        .order_by(candidates.c.shared.desc(), User.id)
+        .limit(limit)
+    )
+    return [(user, count / len(query_grams)) for user, count in db.session.execute(stmt)]
+
+
+#=== MESSAGES ===
+
+def message_terms(message):
+    return tokenize(f"{message.content} {message.label or ''}")
+
+
+def index_message(message):
+    # Call inside the message's transaction, after it has an id
+    participants = {message.sender_id, message.recipient_id}
+    postings = [
+        {"user_id": user_id, "term": term, "message_id": message.id}
+        for user_id in participants
+        for term in message_terms(message)
+    ]
+    if postings:
+        db.session.execute(insert(MessageTerm), postings)
+
+
+def match_messages(user_id, text, prefix=True):
+    """Ranked hits for `text` among the messages user_id sent or received.
+
+    Returns a statement selecting (message_id, score), best first: score is
+    the number of query words a message contains. With `prefix`, the last
+    word also matches as a prefix, counting once however many words it hits.
+    Returns None when `text` has no searchable words.
+    """
+    terms = tokenize(text)
+    if not terms:
+        return None
+
+    exact = terms[:-1] if prefix else terms
+    conditions = [MessageTerm.term.in_(exact)] if exact else []
+    if prefix:
+        escaped = terms[-1].replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        conditions.append(MessageTerm.term.like(f"{escaped}%", escape="\\"))
+
+    matched = case((MessageTerm.term.in_(exact), MessageTerm.term), else_=literal("*")) if exact else literal("*")
+    score = func.count(func.distinct(matched)).label("score") if prefix else func.count(MessageTerm.term).label("score")
+    return (
+        select(MessageTerm.message_id, score)
+        .where(MessageTerm.user_id == user_id, or_(*conditions))
+        .group_by(MessageTerm.message_id)
+        .order_by(score.desc(), MessageTerm.message_id.desc())
+    )
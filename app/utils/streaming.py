@@ -0,0 +1,38 @@
+from flask import Response, request, stream_with_context, current_app
+from app.models import db
+
+STREAM_BATCH_SIZE = 500
+FLUSH_BYTES = 64 * 1024
+
+
+def wants_stream():
+    # Collection endpoints switch to streaming with ?stream=1
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def stream_query(stmt, dump, scalars=True, batch_size=STREAM_BATCH_SIZE):
+    """Stream the rows of `stmt` to the client as one JSON array.
+
+    Rows are fetched from the server in batches of `batch_size` (yield_per)
+    and each is passed through `dump` and encoded as it arrives, so memory
+    stays flat regardless of the number of rows.
+    """
+    def generate():
+        result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+        rows = result.scalars() if scalars else result
+
+        buffer = ["["]
+        size = 1
+        first = True
+        for row in rows:
+            item = current_app.json.dumps(dump(row))
+            buffer.append(item if first else "," + item)
+            size += len(item) + 1
+            first = False
+            if size >= FLUSH_BYTES:
+                yield "".join(buffer)
+                buffer, size = [], 0
+        buffer.append("]")
+        yield "".join(buffer)
+
+    return Response(stream_with_context(generate()), mimetype="application/json")
@@ -0,0 +1,127 @@
+import base64
+import hashlib
+import os
+import re
+import tempfile
+from flask import request
+from werkzeug.formparser import parse_form_data
+
+ALLOWED_IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "gif", "webp"}
+STORED_NAME_RE = re.compile(r"^[0-9a-f]{64}\.(png|jpe?g|gif|webp)$")
+
+
+class HashingSink:
+    # Target for werkzeug's multipart parser: each chunk of the file body is
+    # written straight to a temp file in the upload folder and fed to sha256,
+    # so the upload is never held in memory
+    def __init__(self, directory):
+        fd, self.path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+        self.file = os.fdopen(fd, "w+b")
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.digest.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def close(self):
+        self.file.close()
+
+
+def _commit(sink_path, digest, directory, extension):
+    # Content-addressed: identical images end up as the same file
+    filename = f"{digest}.{extension}"
+    final_path = os.path.join(directory, filename)
+    if os.path.exists(final_path):
+        os.remove(sink_path)
+    else:
+        os.replace(sink_path, final_path)
+    return filename
+
+
+def image_extension(filename):
+    extension = os.path.splitext(filename or "")[1].lstrip(".").lower()
+    return extension if extension in ALLOWED_IMAGE_EXTENSIONS else None
+
+
+def receive_image(directory, field="image"):
+    """Stream the multipart file `field` of the current request into `directory`.
+
+    Returns the stored file name (<sha256>.<ext>). Raises ValueError for a
+    missing file or unsupported type, and RequestEntityTooLarge when the body
+    exceeds MAX_CONTENT_LENGTH.
+    """
+    sinks = []
+
+    def stream_factory(total_content_length, content_type, filename, content_length=None):
+        sink = HashingSink(directory)
+        sinks.append(sink)
+        return sink
+
+    try:
+        _, _, files = parse_form_data(
+            request.environ,
+            stream_factory=stream_factory,
+            max_content_length=request.max_content_length,
+            silent=False,
+        )
+        upload = files.get(field)
+        if upload is None or not upload.filename:
+            raise ValueError(f"No file provided in '{field}'")
+
+        extension = image_extension(upload.filename)
+        if not extension or not (upload.mimetype or "").startswith("image/"):
+            raise ValueError(f"Unsupported image type; allowed: {', '.join(sorted(ALLOWED_IMAGE_EXTENSIONS))}")
+
+        sink = upload.stream
+        sink.close()
+        return _commit(sink.path, sink.digest.hexdigest(), directory, extension)
+    finally:
+        # Anything not committed (other fields, failed uploads) is discarded
+        for sink in sinks:
+            sink.close()
+            if os.path.exists(sink.path):
+                os.remove(sink.path)
+
+
+def store_image_bytes(data, directory, extension="png"):
+    # Same content-addressed layout for images that arrive in memory (base64)
+    fd, path = tempfile.mkstemp(dir=directory, prefix=".upload-")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    return _commit(path, hashlib.sha256(data).hexdigest(), directory, extension)
+
+
+def is_stored_image(directory, filename):
+    # True for a name produced by receive_image/store_image_bytes that exists on disk
+    return bool(STORED_NAME_RE.match(filename or "")) and os.path.exists(os.path.join(directory, filename))
+
+
+def resolve_image(value, directory):
+    """Turn an `image` payload value into a stored file name.
+
+    Accepts a reference to an image already uploaded via receive_image (any
+    path ending in the stored name) or, for older clients, a base64 data URL.
+    Raises ValueError otherwise.
+    """
+    if value.startswith("data:"):
+        header, _, encoded = value.partition(",")
+        extension = header[len("data:image/"):].split(";")[0].lower() if header.startswith("data:image/") else ""
+        if extension not in ALLOWED_IMAGE_EXTENSIONS:
+            raise ValueError("Unsupported image type")
+        return store_image_bytes(base64.b64decode(encoded), directory, extension)
+
+    filename = value.rsplit("/", 1)[-1]
+    if not is_stored_image(directory, filename):
+        raise ValueError("Unknown image; upload it first")
+    return filename
@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+from itertools import islice
+from marshmallow import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+from app.models import User, UserTrigram, db
+from app.utils.passwords import hash_passwords
+from app.utils.search import index_user, user_trigrams
+
+# Bulk user import. Input is read as a stream of rows (CSV with a header line,
+# or JSON Lines), so file size doesn't matter. Each batch is validated,
+# checked for duplicate emails before any hashing, hashed across the
+# password pool, then inserted with one executemany for the users and one
+# for their search trigrams, and committed. Bad rows are reported and skipped;
+# they never abort the batch they are in.
+
+FORMATS = ("csv", "jsonl")
+DEFAULT_BATCH_SIZE = 1000
+
+
+def read_rows(stream, fmt):
+    """Yield (row number, dict or None, error or None) from a binary stream."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # Cells past the header end up under the None key
+            yield reader.line_num, {key: value for key, value in row.items() if key}, None
+    elif fmt == "jsonl":
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_num, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(row, dict):
+                yield line_num, None, "Expected a JSON object"
+                continue
+            yield line_num, row, None
+    else:
+        raise ValueError(f"Unknown format {fmt!r}; expected one of: {', '.join(FORMATS)}")
+
+
+def import_users(rows, schema, batch_size=DEFAULT_BATCH_SIZE, max_rows=None):
+    """Import rows from read_rows(); returns {"created": n, "errors": [...]}.
+
+    With max_rows, rows past the limit are not read and one error records it.
+    """
+    report = {"created": 0, "errors": []}
+    seen = set()  # normalized emails from earlier rows of this file
+
+    rows = iter(rows)
+    limited = islice(rows, max_rows) if max_rows is not None else rows
+    while True:
+        batch = list(islice(limited, batch_size))
+        if not batch:
+            break
+        _import_batch(batch, schema, seen, report)
+
+    if max_rows is not None and next(rows, None) is not None:
+        report["errors"].append({"row": None, "errors": f"Stopped after {max_rows} rows"})
+    return report
+
+
+def normalize_email(email):
+    # Emails are matched case-insensitively, like MySQL's default collation
+    return email.strip().lower()
+
+
+def _import_batch(batch, schema, seen, report):
+    errors = report["errors"]
+    valid = []
+    for row_num, data, error in batch:
+        if error:
+            errors.append({"row": row_num, "errors": error})
+            continue
+        try:
+            user_data = schema.load(data)
+        except ValidationError as e:
+            errors.append({"row": row_num, "errors": e.messages})
+            continue
+        user_data["email"] = user_data["email"].strip()
+        key = normalize_email(user_data["email"])
+        if key in seen:
+            errors.append({"row": row_num, "errors": {"email": ["Duplicate email in this file"]}})
+            continue
+        seen.add(key)
+        valid.append((row_num, user_data))
+
+    # Emails already registered, in one query, before spending time on hashing;
+    # compared on the normalized form so ALICE@x.com clashes with alice@x.com
+    existing = set(db.session.execute(
+        select(func.lower(User.email))
+        .where(func.lower(User.email).in_([normalize_email(user_data["email"]) for _, user_data in valid]))
+    ).scalars()) if valid else set()
+    if existing:
+        for row_num, user_data in valid:
+            if normalize_email(user_data["email"]) in existing:
+                errors.append({"row": row_num, "errors": {"email": ["Email already registered"]}})
+        valid = [
+            (row_num, user_data) for row_num, user_data in valid
+            if normalize_email(user_data["email"]) not in existing
+        ]
+    if not valid:
+        return
+
+    hashes = hash_passwords([user_data["password"] for _, user_data in valid])
+    records = [
+        {
+            "firstname": user_data["firstname"],
+            "lastname": user_data["lastname"],
+            "email": user_data["email"],
+            "password": password_hash,
+        }
+        for (_, user_data), password_hash in zip(valid, hashes)
+    ]
+
+    try:
+        db.session.execute(insert(User), records)
+        # Ids by email; no INSERT .. RETURNING so this works on MySQL too
+        created = db.session.execute(
+            select(User.id, User.firstname, User.lastname, User.email)
+            .where(User.email.in_([record["email"] for record in records]))
+        ).all()
+        grams = [
+            {"trigram": gram, "user_id": user.id}
+            for user in created
+            for gram in user_trigrams(user)
+        ]
+        if grams:
+            db.session.execute(insert(UserTrigram), grams)
+        db.session.commit()
+        report["created"] += len(records)
+    except IntegrityError:
+        # Someone registered one of these emails meanwhile: redo the batch
+        # row by row so only the conflicting rows fail
+        db.session.rollback()
+        for (row_num, _), record in zip(valid, records):
+            try:
+                user = User(**record)
+                db.session.add(user)
+                db.session.flush()
+                index_user(user)
+                db.session.commit()
+                report["created"] += 1
+            except IntegrityError:
+                db.session.rollback()
+                errors.append({"row": row_num, "errors": {"email": ["Email already registered"]}})
@@ -2,8 +2,12 @@ from flask import request, jsonify
 import jwt
 from datetime import datetime, timedelta, timezone
 from functools import wraps
+from collections import OrderedDict
 import os
-from app.models import User, db
+import threading
+import time
+from sqlalchemy import select
+from app.models import User, Profile, db
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -73,6 +77,79 @@ def encode_token(user_id):
         
 #     return wrapper
 
+class PrincipalGone(BaseException):
+    # The token's user was deleted (through another worker) while the token
+    # was cached. A BaseException so routes' blanket `except Exception`
+    # handlers let it through to token_required, which answers 401.
+    pass
+
+
+class Principal:
+    # The authenticated caller handed to routes. `id` comes straight from the
+    # verified token; the User row is only loaded the first time any other
+    # attribute is read or written.
+    __slots__ = ("id", "_user")
+
+    def __init__(self, user_id):
+        object.__setattr__(self, "id", user_id)
+        object.__setattr__(self, "_user", None)
+
+    @property
+    def user(self):
+        if self._user is None:
+            user = db.session.get(User, self.id)
+            if user is None:
+                invalidate_user_tokens(self.id)
+                raise PrincipalGone()
+            object.__setattr__(self, "_user", user)
+        return self._user
+
+    def __getattr__(self, name):
+        return getattr(self.user, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.user, name, value)
+
+
+# Verified tokens, keyed by their signature:
+#   signature -> (signed header.payload, user_id, cached_until)
+# Entries live until the token expires, capped by PRINCIPAL_CACHE_TTL so a user
+# deleted through another worker process stops authenticating soon after.
+PRINCIPAL_CACHE_SIZE = 10000
+PRINCIPAL_CACHE_TTL = 300  # seconds
+_principal_cache = OrderedDict()
+_principal_cache_lock = threading.Lock()
+
+
+def _cached_principal(signature, signed):
+    with _principal_cache_lock:
+        entry = _principal_cache.get(signature)
+        if entry is None or entry[0] != signed:
+            return None
+        _, user_id, cached_until = entry
+        if cached_until <= time.time():
+            del _principal_cache[signature]
+            return None
+        _principal_cache.move_to_end(signature)
+        return user_id
+
+
+def _cache_principal(signature, signed, user_id, expires_at):
+    cached_until = min(expires_at, time.time() + PRINCIPAL_CACHE_TTL)
+    with _principal_cache_lock:
+        _principal_cache[signature] = (signed, user_id, cached_until)
+        _principal_cache.move_to_end(signature)
+        while len(_principal_cache) > PRINCIPAL_CACHE_SIZE:
+            _principal_cache.popitem(last=False)
+
+
+def invalidate_user_tokens(user_id):
+    # Call when a user is deleted so their cached tokens stop working at once
+    with _principal_cache_lock:
+        for signature in [sig for sig, entry in _principal_cache.items() if entry[1] == user_id]:
+            del _principal_cache[signature]
+
+
 def token_required(func):
     @wraps(func)
     def decorated(*args, **kwargs):
@@ -83,28 +160,48 @@ def token_required(func):
 
         # Extract the token from the Authorization header
         if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split(" ")[1]
+            parts = request.headers['Authorization'].split(" ")
+            token = parts[1] if len(parts) > 1 else None
 
         if not token:
             return jsonify({"message": "Token is missing!"}), 401
 
+        signed, _, signature = token.rpartition(".")
+        user_id = _cached_principal(signature, signed)
+
+        if user_id is None:
+            try:
+                # Decode the token
+                # Without an exp a token could never be evicted from the cache
+                payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'], options={"require": ["exp", "sub"]})
+                user_id = int(payload['sub'])
+            except jwt.ExpiredSignatureError:
+                return jsonify({"message": "Token has expired!"}), 401
+            except (jwt.InvalidTokenError, KeyError, ValueError):
+                return jsonify({"message": "Invalid token!"}), 401
+
+            # One existence check per token, not per request
+            if db.session.execute(select(User.id).where(User.id == user_id)).scalar() is None:
+                return jsonify({"message": "User not found!"}), 404
+            _cache_principal(signature, signed, user_id, payload['exp'])
+
+        # Pass the caller to the route
         try:
-            print(f"Token received: {token}")  # Debugging
+            return func(current_user=Principal(user_id), *args, **kwargs)
+        except PrincipalGone:
+            db.session.rollback()
+            return jsonify({"message": "User not found!"}), 401
+    return decorated
 
-            # Decode the token
-            payload = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            print(f"Decoded payload: {payload}")  # Debugging
 
-            # Fetch the current user using the user ID in the token's `sub` field
-            current_user = db.session.get(User, payload['sub'])
-            if not current_user:
-                return jsonify({"message": "User not found!"}), 404
-        except jwt.ExpiredSignatureError:
-            return jsonify({"message": "Token has expired!"}), 401
-        except jwt.InvalidTokenError as e:
-            print(f"Invalid token error: {e}")  # Debugging
-            return jsonify({"message": "Invalid token!"}), 401
-
-        # Pass current_user to the route
-        return func(current_user=current_user, *args, **kwargs)
-    return decorated
\ No newline at end of file
+def admin_required(func):
+    # Goes under @token_required; admins are users whose profile says so
+    @wraps(func)
+    def decorated(current_user, *args, **kwargs):
+        account_type = db.session.execute(
+            select(Profile.account_type).where(Profile.user_id == current_user.id)
+        ).scalar()
+        if account_type != 'admin':
+            return jsonify({"message": "Admin access required"}), 403
+        return func(current_user, *args, **kwargs)
+    return decorated
@@ -0,0 +1,77 @@
+"""Vectorized radius filter vs a per-row distance loop over the same candidates.
+
+    python benchmarks/bench_geo.py [candidates] [repeats]
+
+The loop baselines resolve each candidate's ZIP from the bundled table, as
+the old search did through the geocoder but without its network round trips.
+"""
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.geo import EARTH_RADIUS_MILES, filter_within_radius, get_zip_centroids  # noqa: E402
+
+ORIGIN_ZIP = "10001"
+RADIUS_MILES = 25
+
+
+class Candidate:
+    def __init__(self, zip_code, latitude, longitude):
+        self.zip_code = zip_code
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+def best_of(repeats, func):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def haversine_loop(lat, lon, other_lat, other_lon):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat, lon, other_lat, other_lon))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+def main(candidates=2000, repeats=5):
+    centroids = get_zip_centroids()
+    lat, lon = centroids.lookup(ORIGIN_ZIP)
+    random.seed(0)
+    zips = [f"{zip_code:05d}" for zip_code in random.sample(list(centroids.zips), candidates)]
+    items = [Candidate(zip_code, *centroids.lookup(zip_code)) for zip_code in zips]
+
+    def per_row(distance):
+        kept = []
+        for item in items:
+            point = centroids.lookup(item.zip_code)
+            if point and distance((lat, lon), point) <= RADIUS_MILES:
+                kept.append(item)
+        return kept
+
+    expected = per_row(lambda a, b: haversine_loop(*a, *b))
+    assert filter_within_radius(items, lat, lon, RADIUS_MILES) == expected
+
+    vectorized = best_of(repeats, lambda: filter_within_radius(items, lat, lon, RADIUS_MILES))
+    loop = best_of(repeats, lambda: per_row(lambda a, b: haversine_loop(*a, *b)))
+    print(f"{candidates} candidates, {len(expected)} within {RADIUS_MILES} mi of {ORIGIN_ZIP}:")
+    print(f"  vectorized haversine  {vectorized * 1000:8.2f} ms")
+    print(f"  per-row haversine     {loop * 1000:8.2f} ms ({loop / vectorized:.0f}x)")
+
+    try:
+        from geopy.distance import geodesic
+    except ImportError:
+        return
+    geodesic_loop = best_of(1, lambda: per_row(lambda a, b: geodesic(a, b).miles))
+    print(f"  per-row geodesic      {geodesic_loop * 1000:8.2f} ms ({geodesic_loop / vectorized:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
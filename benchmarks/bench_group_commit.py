@@ -0,0 +1,80 @@
+"""Message sends per second with and without MESSAGE_GROUP_COMMIT.
+
+    python benchmarks/bench_group_commit.py [threads] [messages per thread]
+
+Concurrent clients POST /messages/send against a file-backed SQLite
+database, where every commit is an fsync; both modes write to the same
+database, one after the other.
+"""
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-group-commit-')}/bench.db"
+os.environ["RATELIMIT_STORAGE_URI"] = "memory://"
+os.environ["CACHE_TYPE"] = "SimpleCache"
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import create_app  # noqa: E402
+from app.models import Listing, Message, User, db  # noqa: E402
+from app.utils.util import encode_token  # noqa: E402
+
+
+def run(app, headers, threads, per_thread):
+    # Returns (messages per second, number of non-201 responses)
+    failures = []
+
+    def client():
+        test_client = app.test_client()
+        for i in range(per_thread):
+            response = test_client.post("/messages/send", headers=headers,
+                                        json={"recipient_id": 2, "listing_id": 1, "content": f"message {i}"})
+            if response.status_code != 201:
+                failures.append(response.status_code)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return (threads * per_thread - len(failures)) / elapsed, len(failures)
+
+
+def main(threads=16, per_thread=60):
+    app = create_app("DevelopmentConfig")
+    app.config["RATELIMIT_ENABLED"] = False
+    app.debug = False
+    logging.disable(logging.WARNING)  # Per-request query logging would dominate
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(firstname="Sender", lastname="User", email="sender@example.com", password="x"),
+            User(firstname="Recipient", lastname="User", email="recipient@example.com", password="x"),
+        ])
+        db.session.commit()
+        db.session.add(Listing(user_id=1, title="Bench", city="Austin", state="Texas", zip_code="78701", type="job"))
+        db.session.commit()
+        headers = {"Authorization": f"Bearer {encode_token(1)}"}
+
+    print(f"{threads} concurrent senders x {per_thread} messages")
+    for group_commit in (False, True):
+        app.config["MESSAGE_GROUP_COMMIT"] = group_commit
+        rate, failed = run(app, headers, threads, per_thread)
+        print(f"  MESSAGE_GROUP_COMMIT={group_commit!s:<5} {rate:6.0f} msg/s"
+              + (f", {failed} failed" if failed else ""))
+
+    with app.app_context():
+        stored = db.session.scalar(select(func.count()).select_from(Message))
+    assert stored == 2 * threads * per_thread, stored
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,83 @@
+"""POST /users/login throughput for several PASSWORD_HASH_WORKERS settings.
+
+    python benchmarks/bench_passwords.py [threads] [logins] [workers ...]
+
+Each setting serves the same logins from `threads` concurrent clients; 0
+workers hashes inline on the request thread. Gains need spare cores: on a
+single-core host the pool can only keep the GIL free for other requests.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils import passwords  # noqa: E402
+
+EMAIL = "bench@example.com"
+PASSWORD = "correct horse battery staple"
+
+
+def reset_pool():
+    if passwords._pool is not None:
+        passwords._pool.shutdown()
+    passwords._pool = None
+    passwords._pending = None
+
+
+def run(app, threads, logins):
+    # Returns (successful logins per second, {status: count} for the rest)
+    failures = []
+
+    def client():
+        test_client = app.test_client()
+        for _ in range(logins // threads):
+            response = test_client.post("/users/login", json={"email": EMAIL, "password": PASSWORD})
+            if response.status_code != 200:
+                failures.append(response.status_code)
+
+    workers = [threading.Thread(target=client) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    return ((logins // threads) * threads - len(failures)) / elapsed, Counter(failures)
+
+
+def main(threads=8, logins=64, *settings):
+    # Set up here rather than at import: the pool's spawned children import this module
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tempfile.mkdtemp(prefix='bench-passwords-')}/bench.db"
+    os.environ["RATELIMIT_STORAGE_URI"] = "memory://"
+    os.environ["CACHE_TYPE"] = "SimpleCache"
+    from app import create_app
+    from app.models import User, db
+
+    app = create_app("DevelopmentConfig")
+    app.config["RATELIMIT_ENABLED"] = False
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(firstname="Bench", lastname="User", email=EMAIL,
+                            password=passwords._hash(PASSWORD)))
+        db.session.commit()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    print(f"{cpus} usable CPUs, {threads} concurrent clients, {logins} logins per setting")
+    if cpus == 1:
+        print("  (one CPU: expect flat numbers; scaling needs a multi-core host)")
+    for workers in settings or sorted({0, 1, 2, cpus}):
+        reset_pool()
+        app.config["PASSWORD_HASH_WORKERS"] = workers
+        run(app, threads, threads)  # Warm up: start the pool's processes
+        rate, failed = run(app, threads, logins)
+        print(f"  PASSWORD_HASH_WORKERS={workers:<3} {rate:6.1f} logins/s"
+              + "".join(f", {count} x {status}" for status, count in sorted(failed.items())))
+    reset_pool()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,52 @@
+"""Compiled serializers vs marshmallow's schema.dump() on a list endpoint's rows.
+
+    python benchmarks/bench_serializers.py [rows] [repeats]
+"""
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blueprints.listings.schemas import ListingSchema  # noqa: E402
+from app.blueprints.users.schemas import UserSchema  # noqa: E402
+from app.models import Listing, User  # noqa: E402
+from app.utils.fields import sparse_schema  # noqa: E402
+from app.utils.serializers import dump_many  # noqa: E402
+
+
+def best_of(repeats, func):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(rows=10000, repeats=5):
+    now = datetime.now()
+    cases = {
+        "listings": (ListingSchema, [
+            Listing(id=i, user_id=1, title=f"Listing {i}", description="d" * 50, city="Austin", state="Texas",
+                    zip_code="78701", type="job", created_at=now)
+            for i in range(rows)
+        ]),
+        "users": (UserSchema, [
+            User(id=i, firstname="Ann", lastname="Smith", email=f"u{i}@example.com", password="x",
+                 rating=4.5, rating_sum=9, rating_count=2, created_at=now)
+            for i in range(rows)
+        ]),
+    }
+    for name, (schema_class, objs) in cases.items():
+        schema = sparse_schema(schema_class, None)
+        assert dump_many(schema, objs) == schema.dump(objs)
+        slow = best_of(repeats, lambda: schema.dump(objs))
+        fast = best_of(repeats, lambda: dump_many(schema, objs))
+        print(f"{name:9} {rows} rows: schema.dump {slow * 1000:7.1f} ms, compiled {fast * 1000:7.1f} ms"
+              f" ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
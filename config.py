@@ -3,7 +3,22 @@ import os
 class DevelopmentConfig:
     SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
     DEBUG = True
-    CACHE_TYPE = "SimpleCache"
+    # Shared by every worker process on the host, so an invalidation in one
+    # worker is seen by all; CACHE_DIR defaults to <instance path>/cache
+    CACHE_TYPE = os.environ.get('CACHE_TYPE', 'FileSystemCache')
+    CACHE_DIR = os.environ.get('CACHE_DIR')
+    CACHE_THRESHOLD = 10000  # Entries before the oldest are pruned
+    QUERY_REPEAT_THRESHOLD = 5  # Same SQL this many times in one request is logged as N+1
+    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # Image uploads
+    # Batch message inserts into one commit per burst (see app/utils/group_commit.py)
+    MESSAGE_GROUP_COMMIT = os.environ.get('MESSAGE_GROUP_COMMIT', '').lower() in ('1', 'true', 'yes')
+    # memory:// for one process; tcp://host:port to fan out through `flask messages broker`
+    PUBSUB_URL = os.environ.get('PUBSUB_URL', 'memory://')
+    # Counters shared by all worker processes on the host (see app/utils/ratelimit.py)
+    RATELIMIT_STORAGE_URI = os.environ.get(
+        'RATELIMIT_STORAGE_URI',
+        None if os.name == 'posix' else 'memory://',  # None: mmap file in the instance path
+    )
 
 
 class TextingConfig:
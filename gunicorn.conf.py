@@ -0,0 +1,13 @@
+# gunicorn settings for running the app with several workers, e.g.
+#   PROMETHEUS_MULTIPROC_DIR=/path/to/empty/dir gunicorn -w 4 "app:create_app('DevelopmentConfig')"
+# gunicorn reads this file from the working directory automatically. Nothing
+# here imports the app, so the master process stays small.
+import os
+
+
+def child_exit(server, worker):
+    # Drops the dead worker's live gauge files so the in-flight livesum only
+    # adds up running processes (see app/utils/metrics.py)
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,27 @@
+import os
+
+import pytest
+
+# An in-memory database and process-local limiter/cache, before the app reads its config
+os.environ.setdefault("SQLALCHEMY_DATABASE_URI", "sqlite://")
+os.environ.setdefault("RATELIMIT_STORAGE_URI", "memory://")
+os.environ.setdefault("CACHE_TYPE", "SimpleCache")
+
+from app import create_app  # noqa: E402
+from app.models import db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app("DevelopmentConfig")
+    app.config.update(TESTING=True, RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,36 @@
+import jwt
+from sqlalchemy import delete
+
+from app.models import Profile, User, db
+from app.utils import util
+from app.utils.util import SECRET_KEY, encode_token
+
+
+def _user():
+    user = User(firstname="Ann", lastname="Smith", email="ann@example.com", password="x")
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+
+def test_token_without_exp_is_rejected(app, client):
+    token = jwt.encode({"sub": str(_user())}, SECRET_KEY, algorithm="HS256")
+    response = client.get("/profile/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
+
+
+def test_cached_token_of_deleted_user_is_rejected(app, client):
+    util._principal_cache.clear()
+    user_id = _user()
+    db.session.add(Profile(user_id=user_id, city="Austin"))
+    db.session.commit()
+    headers = {"Authorization": f"Bearer {encode_token(user_id)}"}
+    assert client.get("/profile/", headers=headers).status_code == 200  # Token now cached
+
+    # Deleted by another worker: this process's cache still has the token
+    db.session.execute(delete(Profile).where(Profile.user_id == user_id))
+    db.session.execute(delete(User).where(User.id == user_id))
+    db.session.commit()
+    response = client.delete("/profile/", headers=headers)  # Reads current_user.profile
+    assert response.status_code == 401
+    assert not util._principal_cache
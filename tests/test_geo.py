@@ -0,0 +1,37 @@
+import pytest
+
+from app.utils import geo
+
+
+class _Response:
+    def __init__(self, body, status_code=200):
+        self.body = body
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+@pytest.mark.parametrize("body", [
+    {},
+    {"places": []},
+    {"places": [{"place name": "Nowhere"}]},
+    [],
+    ValueError("not JSON"),
+])
+def test_unusable_fallback_answer_is_unknown_location(monkeypatch, body):
+    geo._remote_place.cache_clear()
+    monkeypatch.setattr(geo.requests, "get", lambda *args, **kwargs: _Response(body))
+    assert geo._remote_place("00001") is None
+
+
+def test_fallback_answer(monkeypatch):
+    geo._remote_place.cache_clear()
+    body = {"places": [{"place name": "Somewhere", "state": "Texas"}]}
+    monkeypatch.setattr(geo.requests, "get", lambda *args, **kwargs: _Response(body))
+    assert geo._remote_place("00002") == ("Somewhere", "Texas")
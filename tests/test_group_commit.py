@@ -0,0 +1,31 @@
+import threading
+import time
+
+import pytest
+
+from app.utils.group_commit import GroupCommitBusy, GroupCommitPending, GroupCommitter
+
+
+def test_timed_out_items_are_withdrawn_or_reported_pending(app):
+    gate = threading.Event()
+    written = []
+
+    def write(item):
+        gate.wait()
+        written.append(item)
+        return item
+
+    committer = GroupCommitter(app, write, max_batch=1, max_wait=0.001)
+    in_flight = committer.submit(1)
+    time.sleep(0.1)  # The flusher takes it and blocks in write()
+    queued = committer.submit(2)
+
+    with pytest.raises(GroupCommitBusy):
+        committer.wait(queued, 0.05)
+    with pytest.raises(GroupCommitPending):
+        committer.wait(in_flight, 0.05)
+
+    gate.set()
+    assert in_flight.result(timeout=1) == 1
+    assert committer.wait(committer.submit(3), 1) == 3
+    assert written == [1, 3]  # The withdrawn item was never written
@@ -0,0 +1,34 @@
+import json
+
+from app.blueprints.messages import routes
+from app.models import Listing, Message, User, db
+from app.utils.util import encode_token
+
+
+def test_reconnect_replays_everything_missed(app, client, monkeypatch):
+    monkeypatch.setattr(routes, "STREAM_CATCH_UP", 2)
+    sender = User(firstname="Ann", lastname="Smith", email="ann@example.com", password="x")
+    recipient = User(firstname="Bo", lastname="Li", email="bo@example.com", password="x")
+    db.session.add_all([sender, recipient])
+    db.session.flush()
+    listing = Listing(user_id=sender.id, title="t", city="Austin", state="Texas", zip_code="78701", type="job")
+    db.session.add(listing)
+    db.session.flush()
+    messages = [
+        Message(sender_id=sender.id, recipient_id=recipient.id, listing_id=listing.id, content=f"m{i}")
+        for i in range(7)
+    ]
+    db.session.add_all(messages)
+    db.session.commit()
+    ids = [message.id for message in messages]
+
+    response = client.get("/messages/stream", buffered=False, headers={
+        "Authorization": f"Bearer {encode_token(recipient.id)}",
+        "Last-Event-ID": str(ids[0]),
+    })
+    events = iter(response.response)
+    assert next(events).startswith(b"retry")
+    # Six missed messages span three catch-up pages
+    replayed = [json.loads(next(events).decode().split("data: ")[1])["id"] for _ in ids[1:]]
+    assert replayed == ids[1:]
+    response.close()
@@ -0,0 +1,25 @@
+import pytest
+
+from app.utils import passwords
+from app.utils.passwords import PasswordPoolBusy, hash_passwords
+
+
+@pytest.fixture
+def pool(app):
+    app.config["PASSWORD_HASH_WORKERS"] = 1
+    yield passwords._get_pool(1)
+    passwords._pool.shutdown()
+    passwords._pool = passwords._pending = None
+
+
+def test_bulk_hashing_is_refused_when_the_queue_is_full(pool):
+    held = 0
+    while passwords._pending.acquire(blocking=False):
+        held += 1
+    try:
+        with pytest.raises(PasswordPoolBusy):
+            hash_passwords(["secret"] * 3)
+    finally:
+        for _ in range(held):
+            passwords._pending.release()
+
@@ -0,0 +1,24 @@
+from types import SimpleNamespace
+
+from app.utils import pubsub
+from app.utils.pubsub import Hub, MemoryBackend
+
+
+def test_backend_starts_lazily_once_per_process(monkeypatch):
+    hub = Hub()
+    hub.init_app(SimpleNamespace(config={"PUBSUB_URL": "memory://"}))
+    assert hub.backend is None  # Nothing started at app creation
+
+    subscription = hub.subscribe("user:1")
+    hub.publish("user:1", {"id": 1})
+    assert subscription.get(0) == {"id": 1}
+    parent_backend = hub.backend
+    assert isinstance(parent_backend, MemoryBackend)
+
+    # In a forked worker the parent's backend and subscribers are not reused
+    monkeypatch.setattr(pubsub.os, "getpid", lambda: -1)
+    child_subscription = hub.subscribe("user:1")
+    assert hub.backend is not parent_backend
+    hub.publish("user:1", {"id": 2})
+    assert child_subscription.get(0) == {"id": 2}
+    assert subscription.get(0) is None
@@ -0,0 +1,39 @@
+import time
+
+from app.utils import ratelimit
+from app.utils.ratelimit import MmapStorage
+
+
+def test_keys_stay_within_probe_window_when_shard_is_full(tmp_path, monkeypatch):
+    storage = MmapStorage(f"mmap://{tmp_path}/rl.bin?slots=256&shards=1")
+    reads = []
+    unpack_from = ratelimit.SLOT.unpack_from
+    monkeypatch.setattr(ratelimit, "SLOT", type("Slot", (), {
+        "size": ratelimit.SLOT.size,
+        "pack_into": ratelimit.SLOT.pack_into,
+        "unpack_from": staticmethod(lambda *args: reads.append(1) or unpack_from(*args)),
+    }))
+
+    # Far more distinct keys than slots: no empty slot is left anywhere
+    for i in range(2000):
+        assert storage.incr(f"key{i}", 60) == 1
+    reads.clear()
+    assert storage.get("never-seen") == 0
+    assert storage.incr("fresh", 60) == 1
+    assert storage.incr("fresh", 60) == 2
+    assert len(reads) <= 3 * ratelimit.MAX_PROBE
+
+
+def test_expired_and_cleared_slots_are_reused(tmp_path):
+    storage = MmapStorage(f"mmap://{tmp_path}/rl.bin?slots=64&shards=1")
+    for i in range(64):
+        storage.incr(f"old{i}", 0.01 if i % 2 else 60)
+    for i in range(0, 64, 2):
+        storage.clear(f"old{i}")
+    time.sleep(0.02)
+
+    # Every slot is occupied by an expired or cleared key; new keys take them over
+    for i in range(ratelimit.MAX_PROBE // 2):
+        assert storage.incr(f"new{i}", 60) == 1
+    assert all(storage.get(f"new{i}") == 1 for i in range(ratelimit.MAX_PROBE // 2))
+    assert all(storage.get(f"old{i}") == 0 for i in range(64))
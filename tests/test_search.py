@@ -0,0 +1,65 @@
+from sqlalchemy import select
+
+import unicodedata
+
+from app.models import Listing, Profile, User, db
+from app.utils.search import index_listing, index_user, match_listings, tokenize
+
+
+def _listing(user, title, city, state):
+    listing = Listing(user_id=user.id, title=title, city=city, state=state, zip_code="78701", type="job")
+    db.session.add(listing)
+    db.session.flush()
+    index_listing(listing)
+    return listing
+
+
+def _titles(**kwargs):
+    return sorted(listing.title for listing in db.session.scalars(match_listings(select(Listing), **kwargs)))
+
+
+def test_prefix_does_not_match_location_terms(app):
+    user = User(firstname="Ann", lastname="Smith", email="ann@example.com", password="x")
+    db.session.add(user)
+    db.session.flush()
+    _listing(user, "Fix a sink", "Austin", "Texas")
+    _listing(user, "Stair repair", "Boston", "Massachusetts")
+    _listing(user, "Guitar lessons", "Denver", "Colorado")
+    db.session.commit()
+
+    # "st" and "city" are prefixes of the city:/state: postings every listing has
+    assert _titles(text="st") == ["Stair repair"]
+    assert _titles(text="city") == []
+    assert _titles(text="sta") == ["Stair repair"]
+    assert _titles(text="gui", location="Denver") == ["Guitar lessons"]
+    assert _titles(location="texas") == ["Fix a sink"]
+
+
+def _user(first, last, email, city=None):
+    user = User(firstname=first, lastname=last, email=email, password="x")
+    db.session.add(user)
+    db.session.flush()
+    index_user(user)
+    if city:
+        db.session.add(Profile(user_id=user.id, city=city))
+    return user
+
+
+def test_tokenize_keeps_non_ascii_words():
+    decomposed = unicodedata.normalize("NFD", "José")
+    assert tokenize(f"José ZOË {decomposed} Straße") == ["josé", "zoë", "strasse"]
+
+
+def test_people_search_handles_accents_and_location_only(app, client):
+    _user("José", "García", "jose@example.com", city="Austin")
+    _user("Zoë", "Müller", "zoe@example.com", city="Boston")
+    _user("Joseph", "Smith", "joseph@example.com", city="Austin")
+    db.session.commit()
+
+    found = client.get("/search/search/users", query_string={"query": "José García"}).json
+    assert found[0]["firstname"] == "José"
+    assert client.get("/search/search/users", query_string={"query": "zoë"}).json[0]["firstname"] == "Zoë"
+
+    in_austin = client.get("/search/search/users", query_string={"location": "austin"}).json
+    assert [user["firstname"] for user in in_austin] == ["José", "Joseph"]
+    assert client.get("/search/search/users", query_string={"query": "  "}).json == []
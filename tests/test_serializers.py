@@ -0,0 +1,132 @@
+"""Compiled serializers must produce exactly what schema.dump() produces.
+
+Run from the repository root: python -m pytest tests
+"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from marshmallow import Schema, fields, post_dump, pre_dump
+
+from app.blueprints.listings.schemas import ListingSchema
+from app.blueprints.skills.schemas import SkillSchema
+from app.blueprints.transactions.schemas import TransactionSchema
+from app.blueprints.users.schemas import UserSchema
+from app.models import Listing, Skill, Transaction, User
+from app.utils.fields import sparse_schema
+from app.utils.serializers import compile_schema, compiled, dump_many
+
+CREATED = datetime(2024, 5, 17, 9, 30, 15, 123456)
+
+
+def _users():
+    return [
+        User(id=1, firstname="Ann", lastname="Smith", email="ann@example.com", password="hash",
+             rating=4.5, rating_sum=9, rating_count=2, created_at=CREATED),
+        User(id=2, firstname="Bo", lastname="Li", email="bo@example.com", password="hash",
+             rating=0, rating_sum=0, rating_count=0, created_at=None),
+    ]
+
+
+def _listings():
+    return [
+        Listing(id=1, user_id=1, title="Fix a sink", description="Kitchen", city="Austin", state="Texas",
+                zip_code="78701", type="job", image="/listing_images/a.png", created_at=CREATED,
+                latitude=30.27, longitude=-97.74),
+        Listing(id=2, user_id=2, title="Guitar for Python", description=None, city="Boston",
+                state="Massachusetts", zip_code="02108", type="skill_exchange", offered_skill=3,
+                wanted_skill=4, image=None, created_at=None),
+    ]
+
+
+def _transactions():
+    return [
+        Transaction(id=1, listing_id=1, requester_id=2, status="pending", created_at=CREATED, completed_at=None),
+        Transaction(id=2, listing_id=2, requester_id=1, status="completed", created_at=CREATED, completed_at=CREATED),
+    ]
+
+
+def _skills():
+    return [Skill(id=1, name="Plumbing", description="Pipes"), Skill(id=2, name="Guitar", description=None)]
+
+
+@pytest.mark.parametrize("schema_class, rows", [
+    (UserSchema, _users),
+    (ListingSchema, _listings),
+    (TransactionSchema, _transactions),
+    (SkillSchema, _skills),
+])
+def test_repo_schemas_match_marshmallow(schema_class, rows):
+    schema = sparse_schema(schema_class, None)
+    objs = rows()
+    assert dump_many(schema, objs) == schema.dump(objs)
+    # Sparse fieldsets go through the same path
+    some = tuple(name for name, field in schema.fields.items() if not field.load_only)[:2]
+    sparse = sparse_schema(schema_class, some)
+    assert dump_many(sparse, objs) == sparse.dump(objs)
+
+
+def test_hooks_fall_back_to_marshmallow():
+    class Hooked(Schema):
+        id = fields.Int()
+        name = fields.Str()
+
+        @pre_dump
+        def upper(self, obj, **kwargs):
+            return SimpleNamespace(id=obj.id, name=obj.name.upper())
+
+        @post_dump
+        def tag(self, data, **kwargs):
+            data["tagged"] = True
+            return data
+
+    schema = Hooked(many=True)
+    objs = [SimpleNamespace(id=1, name="a"), SimpleNamespace(id=2, name="b")]
+    assert dump_many(schema, objs) == schema.dump(objs) == [
+        {"id": 1, "name": "A", "tagged": True},
+        {"id": 2, "name": "B", "tagged": True},
+    ]
+
+
+def test_missing_attribute_is_omitted_like_marshmallow():
+    class Partial(Schema):
+        id = fields.Int()
+        nope = fields.Int(attribute="not_there")
+
+    schema = Partial(many=True)
+    objs = [SimpleNamespace(id=1), SimpleNamespace(id=2, not_there=5)]
+    assert dump_many(schema, objs) == schema.dump(objs) == [{"id": 1}, {"id": 2, "nope": 5}]
+
+
+def test_data_key_attribute_and_field_types():
+    class Mixed(Schema):
+        id = fields.Int(data_key="ID")
+        title = fields.Str(attribute="name")
+        price = fields.Float()
+        count = fields.Int(as_string=True)  # not inlined
+        when = fields.DateTime(format="%Y-%m-%d")  # not inlined
+        when_iso = fields.DateTime()
+        flag = fields.Bool()  # not inlined
+        tags = fields.List(fields.Str())  # not inlined
+        nested = fields.Nested(lambda: Inner())  # not inlined
+        raw = fields.Raw()
+        default = fields.Str(dump_default="x")
+        blob = fields.Str()
+
+    class Inner(Schema):
+        a = fields.Int()
+
+    schema = Mixed(many=True)
+    objs = [
+        SimpleNamespace(id=1, name="n", price=2, count=3, when=CREATED, when_iso=CREATED, flag=1,
+                        tags=["a", 1], nested=SimpleNamespace(a=4), raw={"k": [1]}, default=None, blob=b"bytes"),
+        SimpleNamespace(id=None, name=None, price=None, count=None, when=None, when_iso=None, flag=None,
+                        tags=None, nested=None, raw=None, blob=None),
+    ]
+    assert dump_many(schema, objs) == schema.dump(objs)
+
+
+def test_compiled_is_cached_per_schema_instance():
+    schema = SkillSchema(many=True)
+    assert compiled(schema) is compiled(schema)
+    assert compile_schema(schema) is not compiled(schema)